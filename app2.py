@@ -4,17 +4,18 @@ APP STREAMLIT - SIMULACIÓN PARADA DE PLANTA SD18MAR26
 Visualizaciones 100% interactivas con Plotly (zoom, hover, filtros)
 =============================================================================
 Instalación:
-    pip install streamlit pandas openpyxl plotly numpy
+    pip install streamlit pandas openpyxl xlsxwriter plotly numpy pyarrow ortools
 
 Ejecución:
-    streamlit run app_paro_planta.py
+    streamlit run app2.py
+
+Sin interfaz (cron / lotes):
+    python simular.py actividades.xlsx pdt.xlsx -o plan.xlsx
 =============================================================================
 """
 
 import io
 import warnings
-from collections import defaultdict
-from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
@@ -24,14 +25,17 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
 
+from exploracion import PARAMETROS, barrido_parametros, frente_pareto, muestras_pesos, simular_riesgo
+from simulacion import (ESCALAS_AVANCE, INICIO_SD, CacheEtapas, CalendarioTurnos, MatrizTecnicos,
+                        bloques_desde_matriz, ejecutar_pipeline, ejecutar_replan, exportar_excel,
+                        exportar_tablas, leer_tabla_pesos)
+
 warnings.filterwarnings("ignore")
 
 # ─────────────────────────────────────────────────────────────────────────────
 # CONSTANTES
 # ─────────────────────────────────────────────────────────────────────────────
 
-INICIO_SD = datetime(2026, 3, 18, 6, 0)
-
 COLORES_CRITICIDAD = {
     "Muy Alta": "#B71C1C",
     "Alta":     "#E53935",
@@ -39,6 +43,26 @@ COLORES_CRITICIDAD = {
     "Baja":     "#43A047",
 }
 
+ORDEN_CRITICIDAD = ["Baja", "Media", "Alta", "Muy Alta"]
+
+# Criticidad vacía o fuera de COLORES_CRITICIDAD
+SIN_CLASIFICAR       = "Sin clasificar"
+COLOR_SIN_CLASIFICAR = "#9E9E9E"
+
+# Gantt escalable: por encima de este nº de actividades visibles se agrega por centro · especialidad
+GANTT_MAX_DETALLE = 400
+
+# Descargas: formato → (archivo, tipo MIME)
+FORMATOS_EXPORTACION = {
+    "Excel (.xlsx)":  ("plan_parada.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.zip)":     ("plan_parada_csv.zip", "application/zip"),
+    "Parquet (.zip)": ("plan_parada_parquet.zip", "application/zip"),
+}
+
+# Matriz de técnicos paginada: solo esta ventana técnicos × horas viaja al navegador
+MATRIZ_FILAS_PAGINA = 50
+MATRIZ_HORAS_VISIBLES = 48
+
 COLORES_CENTRO = {
     "CUS": "#2196F3", "EPO": "#4CAF50", "PAE": "#FF9800", "MRF": "#9C27B0",
     "LBE": "#F44336", "VSA": "#00BCD4", "CQO": "#795548", "CCA": "#E91E63",
@@ -46,483 +70,27 @@ COLORES_CENTRO = {
     "BOG": "#8BC34A", "DEFAULT": "#9E9E9E",
 }
 
-CAPACIDAD_RECURSOS = {
-    "MECÁNICA": 8, "ELÉCTRICA": 6, "INSTRUMENTACIÓN": 5,
-    "TELECOMUNICACIONES": 3, "ENERGÉTICA": 2, "CIVIL": 4,
-    "OPERACIONES": 6, "INSPECCIÓN": 3, "CONTROLES": 2,
-    "SER": 2, "VLV": 2, "AMBIENTAL": 2, "DEFAULT": 4,
-}
-
-
-
-
-# ─────────────────────────────────────────────────────────────────────────────
-# MÓDULO 1: CARGA Y LIMPIEZA
-# ─────────────────────────────────────────────────────────────────────────────
-
-@st.cache_data(show_spinner=False)
-def cargar_actividades(b: bytes) -> pd.DataFrame:
-    df = pd.read_excel(io.BytesIO(b), sheet_name="Lista de Actividades SD", header=0)
-    df.columns = df.columns.str.strip().str.replace("\n", " ")
-    return df
-
-
-@st.cache_data(show_spinner=False)
-def cargar_pdt(b: bytes) -> pd.DataFrame:
-    df = pd.read_excel(io.BytesIO(b), sheet_name="Actividades", header=0)
-    df.columns = df.columns.str.strip().str.replace("\n", " ")
-    return df
-
-
-def limpiar_unificar(df_act: pd.DataFrame, df_pdt: pd.DataFrame) -> pd.DataFrame:
-    pdt = df_pdt.rename(columns={
-        "Centro planificación": "centro",
-        "Actividades":          "actividad",
-        "Orden":                "orden",
-        "Computación":          "computacion",
-        "TIEMPO (Hrs)":         "duracion_h",
-        "ESTADO":               "estado",
-        "ESPECIALIDAD":         "especialidad",
-        "EJECUTOR":             "ejecutor",
-        "CRITICIDAD":           "criticidad",
-        "ASEGURADOR":           "asegurador",
-        "Riesgo del Entorno":   "riesgo_texto",
-        "Criticidad":           "criticidad_num",
-        "Riesgo Entorno":       "riesgo_num",
-        "Avance % Act.":        "avance_pct",
-        "Valor Global %.":      "valor_global",
-        "% ACUM CENTRO":        "acum_centro",
-        "% ACUM TOTAL":         "acum_total",
-        "RUTA CRITICA":         "ruta_critica",
-    })
-    pdt = pdt[pdt["actividad"].notna()].copy()
-    pdt = pdt[pd.to_numeric(pdt["duracion_h"], errors="coerce") > 0].copy()
-
-    act = df_act.rename(columns={
-        "Actividades": "actividad", "Centro planificación": "centro",
-        "CRITICIDAD": "criticidad_act", "HSE OCENSA": "hse",
-        "INTERFERENCIA": "interferencia", "COMENTARIOS": "comentarios",
-    })
-    keep = ["actividad", "criticidad_act", "hse", "interferencia", "comentarios"]
-    act  = act[[c for c in keep if c in act.columns]].dropna(subset=["actividad"])
-    act  = act.drop_duplicates(subset=["actividad"])
-
-    df = pdt.merge(act, on="actividad", how="left")
-    df["duracion_h"]     = pd.to_numeric(df["duracion_h"], errors="coerce").fillna(1).clip(1, 50)
-    df["criticidad_num"] = pd.to_numeric(df["criticidad_num"], errors="coerce").fillna(2)
-    df["riesgo_num"]     = pd.to_numeric(df["riesgo_num"], errors="coerce").fillna(1)
-    df["valor_global"]   = pd.to_numeric(df["valor_global"], errors="coerce").fillna(0)
-    df["avance_pct"]     = pd.to_numeric(df["avance_pct"], errors="coerce").fillna(0)
-    df["criticidad"]     = df["criticidad"].fillna("Baja").str.strip()
-    df["ruta_critica"]   = df["ruta_critica"].fillna("NO").str.upper().str.strip()
-    df["centro"]         = df["centro"].fillna("GEN").str.strip().str.upper()
-    df["estado"]         = df["estado"].fillna("PROGRAMADO").str.strip().str.upper()
-    df["especialidad"]   = df["especialidad"].fillna("DEFAULT").str.strip().str.upper()
-
-    df["ejecutor"] = df["ejecutor"].fillna("").str.strip().str.upper()
-    df = df[df["ejecutor"].isin(["MASSY ENERGY", "MASSY ENERGY GEN"])]
-
-    # Diccionario de correcciones comunes
-    correcciones = {
-        "ELÉCTRCIA": "ELÉCTRICA",
-        "INSTRUMEMTACIÓN": "INSTRUMENTACIÓN",
-        "INSTRUMENTACION": "INSTRUMENTACIÓN",
-        "MECÁNICA/INSTRUMENTACIÓN": "MECÁNICA, INSTRUMENTACIÓN",
-        "MECÁNICA/INSTRUMEMTACIÓN": "MECÁNICA, INSTRUMENTACIÓN",
-    }
-
-    df["especialidad"] = df["especialidad"].replace(correcciones)
-    df["especialidad"] = df["especialidad"].str.replace(r"\s*,\s*", ", ", regex=True)
-    df = df.reset_index(drop=True)
-    df["id"] = df.index
-    return df
-
-
-# ─────────────────────────────────────────────────────────────────────────────
-# MÓDULO 2: SCORING MULTICRITERIO
-# ─────────────────────────────────────────────────────────────────────────────
-
-def scoring(df: pd.DataFrame, w_crit, w_riesgo, w_valor, w_dur) -> pd.DataFrame:
-    def norm(s):
-        mn, mx = s.min(), s.max()
-        return pd.Series(np.ones(len(s)), index=s.index) if mx == mn else (s - mn) / (mx - mn)
-    df = df.copy()
-    df["score"] = (w_crit * norm(df["criticidad_num"])
-                 + w_riesgo * norm(df["riesgo_num"])
-                 + w_valor * norm(df["valor_global"])
-                 - w_dur * norm(df["duracion_h"]))
-    df.loc[df["ruta_critica"] == "SI", "score"] += 1.0
-    df["score"] += df["criticidad"].map({"Muy Alta": 0.8, "Alta": 0.5, "Media": 0.2, "Baja": 0.0}).fillna(0)
-    df["prioridad"] = df["score"].rank(ascending=False, method="first").astype(int)
-    return df.sort_values("score", ascending=False).reset_index(drop=True)
-
-# ─────────────────────────────────────────────────────────────────────────────
-# MÓDULO 3: PROGRAMACIÓN GREEDY + RESOURCE LEVELING
-# ─────────────────────────────────────────────────────────────────────────────
-
-def programar(df: pd.DataFrame, horizonte: int, riesgo_thr: 4 ) -> pd.DataFrame:
-    
-    HORIZONTE = 36
-    uso_rec = defaultdict(int)
-    uso_cr  = defaultdict(set)
-    rows    = []
-
-    df = df.sort_values("score", ascending=False).reset_index(drop=True)
-
-    for _, act in df.iterrows():
-        dur    = max(1, int(act["duracion_h"]))
-        esp_k  = str(act["especialidad"])[:25]
-        cap    = next((v for k, v in CAPACIDAD_RECURSOS.items() if k in esp_k.upper()), 4)
-        alto   = act["criticidad_num"] >= riesgo_thr
-        centro = act["centro"]
-        inicio = None
-
-        # Intentar ubicar la actividad dentro del horizonte
-        for t in range(HORIZONTE - dur + 1):
-            if any(uso_rec[(esp_k, h)] >= cap for h in range(t, t + dur)):
-                continue
-            if alto and set(range(t, t + dur)) & uso_cr[centro]:
-                continue
-            inicio = t
-            break
-
-        # Si no se encontró ventana, ubicar en el primer espacio disponible dentro de 36h
-        if inicio is None:
-            # Buscar ventana mínima que tenga menor saturación
-            min_sum = float("inf")
-            min_start = 0
-            for t in range(HORIZONTE - dur + 1):
-                carga = sum(uso_rec[(esp_k, h)] / cap for h in range(t, t + dur))
-                if alto:
-                    cr_conflict = len(set(range(t, t + dur)) & uso_cr[centro])
-                    carga += cr_conflict
-                if carga < min_sum:
-                    min_sum = carga
-                    min_start = t
-            inicio = min_start
-
-        fin = inicio + dur
-        for h in range(inicio, fin):
-            uso_rec[(esp_k, h)] += 1
-        if alto:
-            uso_cr[centro].update(range(inicio, fin))
-
-        inicio_real = INICIO_SD + timedelta(hours=inicio)
-        fin_real    = INICIO_SD + timedelta(hours=fin)
-        turno_n     = (inicio // 8) + 1
-        tmap = {1:"T1 (06-14h)", 2:"T2 (14-22h)", 3:"T3 (22-06h)",
-                4:"T4 (06-14h)", 5:"T5 (14-22h)", 6:"T6 (22-06h)"}
-
-        rows.append({**act.to_dict(),
-                     "start_sd": inicio, "end_sd": fin,
-                     "inicio_real": inicio_real, "fin_real": fin_real,
-                     "turno": tmap.get(turno_n, f"T{turno_n}"),
-                     "dentro_horizonte": True  # Forzamos 36h
-                    })
-
-    df_r = pd.DataFrame(rows)
-    total = df_r["valor_global"].sum()
-    df_r["valor_global_norm"] = (df_r["valor_global"] / total) if total > 0 else 1 / len(df_r)
-    df_r = df_r.sort_values("end_sd")
-    df_r["acum_total_calc"]  = (df_r["valor_global_norm"].cumsum() * 100).round(2)
-    df_r["acum_centro_calc"] = (
-        df_r.groupby("centro")["valor_global_norm"].cumsum()
-        .div(df_r.groupby("centro")["valor_global_norm"].transform("sum"))
-        .mul(100).round(2)
-    )
-    mksp   = df_r["end_sd"].max()
-    crit1  = df_r["ruta_critica"] == "SI"
-    crit2  = df_r["end_sd"] >= (mksp - 2)
-    crit3  = (df_r["criticidad_num"] >= 4) & (df_r["duracion_h"] >= 20)
-    df_r["es_critica"] = crit1 | crit2 | crit3
-    return df_r
-
-
-
-def calcular_pesos(especialidades):
-
-    esp = sorted(set(especialidades))
-
-    # 1 especialidad
-    if len(esp) == 1:
-        return {esp[0]: 1.0}
-
-    # 2 especialidades
-    if len(esp) == 2:
-
-        if set(esp) == {"MECÁNICA", "ELÉCTRICA"}:
-            return {"MECÁNICA": 0.65, "ELÉCTRICA": 0.35}
-
-        if set(esp) == {"MECÁNICA", "INSTRUMENTACIÓN"}:
-            return {"MECÁNICA": 0.70, "INSTRUMENTACIÓN": 0.30}
-
-        if set(esp) == {"ELÉCTRICA", "INSTRUMENTACIÓN"}:
-            return {"ELÉCTRICA": 0.60, "INSTRUMENTACIÓN": 0.40}
-
-    # 3 especialidades
-    return {
-        "MECÁNICA": 0.5,
-        "ELÉCTRICA": 0.3,
-        "INSTRUMENTACIÓN": 0.2
-    }
-# ─────────────────────────────────────────────────────────────────────────────
-# MÓDULO 3C: TECNICOS POR ORDEN DE TRABAJO
-# ─────────────────────────────────────────────────────────────────────────────
-def tecnicos_por_ot(df):
-
-    HORAS_TECNICO = 8
-
-    def redondear_hora(valor):
-        entero = int(valor)
-        decimal = valor - entero
-        if decimal >= 0.5:
-            return entero + 1
-        else:
-            return entero
-
-    rows = []
-
-    for _, act in df.iterrows():
-
-        dur = act["duracion_h"]
-
-        esp_list = (
-            str(act["especialidad"])
-            .replace("/", ",")
-            .replace("INSTRUMENTACION", "INSTRUMENTACIÓN")
-            .upper()
-            .split(",")
-        )
-
-        esp_list = [e.strip() for e in esp_list if e.strip()]
-
-        # NUEVA LÓGICA DE PESOS
-        pesos = calcular_pesos(esp_list)
 
-        for esp, peso in pesos.items():
-
-            horas = round(dur * peso, 2)
-
-            horas_redondeadas = redondear_hora(horas)
-
-            tecnicos = int(np.ceil(horas_redondeadas / HORAS_TECNICO))
-
-            rows.append({
-                "Orden": act["orden"],
-                "Actividad": act["actividad"],
-                "Centro": act["centro"],
-                "Especialidad": esp,
-                "Duracion_h": dur,
-                "Horas_Especialidad": horas,
-                "Horas_Redondeadas": horas_redondeadas,
-                "Tecnicos_Requeridos": tecnicos
-            })
-
-    return pd.DataFrame(rows)
-
-# ─────────────────────────────────────────────────────────
-# MÓDULO 3D-A – DIVISIÓN DE ESPECIALIDADES (CORREGIDO)
-# ─────────────────────────────────────────────────────────
-
-def dividir_especialidades(cron):
-
-    def redondear_hora(valor):
-        entero = int(valor)
-        decimal = valor - entero
-        if decimal >= 0.5:
-            return entero + 1
-        else:
-            return entero
-
-    filas = []
-
-    for _, r in cron.iterrows():
-
-        especialidades = (
-            str(r["especialidad"])
-            .replace("/", ",")
-            .replace("INSTRUMENTACION", "INSTRUMENTACIÓN")
-            .upper()
-            .split(",")
-        )
-
-        especialidades = [e.strip() for e in especialidades if e.strip()]
-
-        # NUEVA LÓGICA
-        pesos = calcular_pesos(especialidades)
-
-        for esp, peso in pesos.items():
-
-            nuevo = r.to_dict()
-
-            horas = round(r["duracion_h"] * peso, 2)
-
-            nuevo["especialidad"] = esp
-            nuevo["duracion_h"] = redondear_hora(horas)
-
-            filas.append(nuevo)
-
-    return pd.DataFrame(filas)
-    
 # ─────────────────────────────────────────────────────────
-# MÓDULO 3D – OPTIMIZADOR DE TÉCNICOS (VERSIÓN FINAL)
+# MÓDULO 3E: GANTT POR ORDEN DE TRABAJO (TURNOS DEL CALENDARIO)
 # ─────────────────────────────────────────────────────────
 
-def optimizar_tecnicos_turnos(cron, horizonte=36):
-    import math
-    import pandas as pd
-
-    cron = cron.copy()
-    cron["hh_restantes"] = cron["duracion_h"]
-
-    TURNOS = [(0,8),(24,32)]  # Turnos diarios
-    HORAS_TECNICO = 16        # Capacidad total por técnico
-
-    # Calcular demanda por centro y especialidad
-    demanda = cron.groupby(["centro","especialidad"])["hh_restantes"].sum().reset_index()
-
-    tecnicos = []
-    for _, r in demanda.iterrows():
-        n = math.ceil(r["hh_restantes"] / HORAS_TECNICO)
-        for i in range(n):
-            tecnicos.append({
-                "tecnico": f"{r['centro']}_{r['especialidad']}_T{i+1}",
-                "centro": r["centro"],
-                "especialidad": r["especialidad"]
-            })
-
-    tecnicos = pd.DataFrame(tecnicos)
-
-    # Crear matriz vacía
-    matriz = pd.DataFrame(
-        "",
-        index=tecnicos["tecnico"],
-        columns=list(range(horizonte))
-    )
-
-    # Diccionario para guardar OT pendiente por técnico
-    actividad_pendiente = {}  # {tecnico: ot_idx}
-
-    # Recorrer técnicos
-    for _, t in tecnicos.iterrows():
-        centro = t["centro"]
-        esp = t["especialidad"]
-
-        for inicio, fin in TURNOS:
-            horas_turno = fin - inicio
-            h = inicio
-
-            while horas_turno > 0:
-
-                # Priorizar OT pendiente
-                ot_idx = actividad_pendiente.get(t["tecnico"], None)
-
-                if ot_idx is None:
-                    ots = cron[
-                        (cron["centro"] == centro) &
-                        (cron["especialidad"] == esp) &
-                        (cron["hh_restantes"] > 0)
-                    ]
-                    if ots.empty:
-                        break
-                    ot_idx = ots.sort_values("hh_restantes", ascending=False).iloc[0].name
-
-                orden = cron.loc[ot_idx, "orden"]
-
-                # Bloque a asignar: mínimo entre horas del turno y horas restantes de la OT
-                bloque = min(horas_turno, cron.loc[ot_idx,"hh_restantes"])
-
-                # Asignar horas consecutivas en la matriz
-                for i in range(bloque):
-                    matriz.loc[t["tecnico"], h] = orden
-                    h += 1
-
-                # Actualizar horas restantes
-                cron.loc[ot_idx,"hh_restantes"] -= bloque
-                horas_turno -= bloque
-
-                # Si la OT no terminó, guardar pendiente para el próximo turno
-                if cron.loc[ot_idx,"hh_restantes"] > 0:
-                    actividad_pendiente[t["tecnico"]] = ot_idx
-                else:
-                    actividad_pendiente.pop(t["tecnico"], None)
-
-    return matriz
-    
-# ─────────────────────────────────────────────────────────
-# MÓDULO 3E: GANTT POR ORDEN DE TRABAJO (TURNOS 0-8 y 24-36)
-# ─────────────────────────────────────────────────────────
-
-def plot_gantt_ot_turnos(matriz, inicio_sd="2026-03-18 06:00"):
-
-    import pandas as pd
-    import plotly.express as px
+def plot_gantt_ot_turnos(bloques, inicio_sd="2026-03-18 06:00"):
+    """
+    Gantt técnico × OT. `bloques` es la salida de bloques_tecnicos() (tal como
+    la entrega el optimizador); también acepta MatrizTecnicos o una matriz de etiquetas.
+    """
+    if isinstance(bloques, MatrizTecnicos):
+        bloques = bloques.bloques()
+    elif "ini_h" not in bloques:
+        bloques = bloques_desde_matriz(bloques)
 
     inicio_dt = pd.to_datetime(inicio_sd)
-
-    # ── Convertir matriz a formato largo ──
-    df = matriz.reset_index()
-    df.rename(columns={df.columns[0]: "tecnico"}, inplace=True)
-
-    df_long = df.melt(
-        id_vars="tecnico",
-        var_name="hora_sd",
-        value_name="orden"
+    df_bloques = bloques.assign(
+        start_dt=inicio_dt + pd.to_timedelta(bloques["ini_h"], unit="h"),
+        end_dt=inicio_dt + pd.to_timedelta(bloques["fin_h"], unit="h"),
     )
 
-    df_long["hora_sd"] = df_long["hora_sd"].astype(int)
-
-    # quitar vacíos
-    df_long = df_long[df_long["orden"] != ""]
-
-    # ── SOLO TURNOS ACTIVOS ──
-    df_long = df_long[
-        ((df_long["hora_sd"] >= 0) & (df_long["hora_sd"] < 8)) |
-        ((df_long["hora_sd"] >= 24) & (df_long["hora_sd"] < 36))
-    ]
-
-    # ── CREAR BLOQUES DE TRABAJO ──
-    bloques = []
-
-    for tec, grp in df_long.groupby("tecnico"):
-
-        grp = grp.sort_values("hora_sd")
-
-        prev_ot = None
-        prev_h = None
-        start_h = None
-
-        for _, row in grp.iterrows():
-
-            ot = row["orden"]
-            h = row["hora_sd"]
-
-            # romper bloque si cambia OT o hay salto de hora
-            if (ot != prev_ot) or (prev_h is not None and h != prev_h + 1):
-
-                if prev_ot is not None:
-                    bloques.append({
-                        "tecnico": tec,
-                        "orden": prev_ot,
-                        "start_dt": inicio_dt + pd.Timedelta(hours=start_h),
-                        "end_dt": inicio_dt + pd.Timedelta(hours=prev_h + 1)
-                    })
-
-                start_h = h
-
-            prev_ot = ot
-            prev_h = h
-
-        if prev_ot is not None:
-            bloques.append({
-                "tecnico": tec,
-                "orden": prev_ot,
-                "start_dt": inicio_dt + pd.Timedelta(hours=start_h),
-                "end_dt": inicio_dt + pd.Timedelta(hours=prev_h + 1)
-            })
-
-    df_bloques = pd.DataFrame(bloques)
-
     if df_bloques.empty:
         return px.scatter(title="No hay datos para mostrar")
 
@@ -570,29 +138,6 @@ def plot_gantt_ot_turnos(matriz, inicio_sd="2026-03-18 06:00"):
 
     return fig
 
-# ─────────────────────────────────────────────────────────────────────────────
-# MÓDULO 4: CURVA S
-# ─────────────────────────────────────────────────────────────────────────────
-
-def curva_s(df: pd.DataFrame, horizonte: int = 51) -> pd.DataFrame:
-    rows = []
-    for h in range(horizonte + 1):
-        comp = df[df["end_sd"] <= h]
-        av   = comp["valor_global_norm"].sum()
-        prog = df[(df["start_sd"] <= h) & (df["end_sd"] > h)]
-        if len(prog):
-            av += prog.apply(
-                lambda r: r["valor_global_norm"] * (h - r["start_sd"]) / max(r["duracion_h"], 1), axis=1
-            ).sum()
-        rows.append({
-            "hora_sd": h,
-            "hora_real": INICIO_SD + timedelta(hours=h),
-            "avance_acum": round(min(av * 100, 100), 2),
-            "acts_completas": len(comp),
-        })
-    return pd.DataFrame(rows)
-
-
 # ─────────────────────────────────────────────────────────────────────────────
 # MÓDULO 5: GRÁFICAS INTERACTIVAS PLOTLY
 # ─────────────────────────────────────────────────────────────────────────────
@@ -600,143 +145,283 @@ def curva_s(df: pd.DataFrame, horizonte: int = 51) -> pd.DataFrame:
 T = "plotly_dark"  # template global
 
 
-def plot_gantt(df: pd.DataFrame) -> go.Figure:
-    df = df.sort_values(["centro", "start_sd"]).copy()
-    df["i_str"] = df["inicio_real"].apply(lambda x: x.strftime("%d/%m/%Y %H:%M") if hasattr(x, "strftime") else "")
-    df["f_str"] = df["fin_real"].apply(lambda x: x.strftime("%d/%m/%Y %H:%M") if hasattr(x, "strftime") else "")
+def _segmentos(ini: np.ndarray, fin: np.ndarray) -> np.ndarray:
+    """Barras como segmentos [inicio, fin, NaN] de un único trazo de líneas (arreglo float)."""
+    x = np.full(len(ini) * 3, np.nan)
+    x[0::3] = ini
+    x[1::3] = fin
+    return x
+
+
+def _tramos_ocupados(df: pd.DataFrame, clave: pd.Series) -> pd.DataFrame:
+    """Une por grupo los intervalos [start_sd, end_sd) que se solapan (vectorizado)."""
+    d = df.assign(grupo=clave.to_numpy()).sort_values(["grupo", "start_sd"], kind="stable")
+    fin_prev = d.groupby("grupo", sort=False)["end_sd"].cummax().groupby(d["grupo"], sort=False).shift()
+    d["tramo"] = (fin_prev.isna() | (d["start_sd"] > fin_prev)).cumsum()
+    # -1 = sin clasificar: el tramo solo queda así si ninguna actividad tiene criticidad conocida
+    d["rango_crit"] = (d["criticidad"].map({c: i for i, c in enumerate(ORDEN_CRITICIDAD)})
+                       .astype(float).fillna(-1))
+    return d.groupby("tramo").agg(
+        grupo=("grupo", "first"), start_sd=("start_sd", "min"), end_sd=("end_sd", "max"),
+        n_act=("actividad", "size"), horas=("duracion_h", "sum"),
+        n_crit=("es_critica", "sum"), rango_crit=("rango_crit", "max"),
+    ).reset_index(drop=True)
+
+
+def plot_gantt_escalable(df: pd.DataFrame, rango=None, grupo: str = None,
+                         max_detalle: int = GANTT_MAX_DETALLE, horizonte: int = 36,
+                         turno_h: int = 8):
+    """
+    Gantt para programas grandes: las barras son segmentos de un trazo WebGL
+    (Scattergl) por criticidad y el hover va en un trazo de marcadores con el
+    texto ya armado por columnas. Solo se dibujan las actividades que cruzan la
+    ventana `rango` (horas SD) y, si se indica, del `grupo` "CENTRO · ESPECIALIDAD".
+    Con más de `max_detalle` visibles se agrega: una fila por centro ·
+    especialidad con sus tramos ocupados. Devuelve (figura, agregada).
+    """
+    h0, h1 = rango or (0, int(df["end_sd"].max()))
+    clave = df["centro"].astype(str) + " · " + df["especialidad"].astype(str)
+    vis = (df["end_sd"] > h0) & (df["start_sd"] < h1)
+    if grupo:
+        vis &= clave == grupo
+    df, clave = df[vis], clave[vis]
+    agregada = len(df) > max_detalle
+
+    if agregada:
+        bar = _tramos_ocupados(df, clave)
+        bar["y"] = bar["grupo"]
+        etiquetas = np.array([SIN_CLASIFICAR, *ORDEN_CRITICIDAD])
+        bar["criticidad"] = etiquetas[bar["rango_crit"].astype(int) + 1]
+        hover = ("<b>" + bar["grupo"] + "</b><br>SD" + bar["start_sd"].astype(str) + " → SD"
+                 + bar["end_sd"].astype(str) + "<br>Actividades: " + bar["n_act"].astype(str)
+                 + " · Horas: " + bar["horas"].round(0).astype(int).astype(str)
+                 + "<br>Críticas: " + bar["n_crit"].astype(int).astype(str)
+                 + "<br><i>Clic para ver el detalle</i>")
+        titulo = f"📅 GANTT AGREGADO — {len(df)} actividades en {bar['grupo'].nunique()} centro · especialidad"
+    else:
+        bar = df.sort_values(["centro", "start_sd"]).assign(y=lambda d: d["actividad"].astype(str))
+        hover = ("<b>" + bar["y"] + "</b><br>Centro: " + bar["centro"].astype(str)
+                 + " · " + bar["especialidad"].astype(str)
+                 + "<br>Duración: <b>" + bar["duracion_h"].astype(str) + "h</b>"
+                 + "<br>Inicio: SD" + bar["start_sd"].astype(str) + " · "
+                 + pd.to_datetime(bar["inicio_real"]).dt.strftime("%d/%m/%Y %H:%M")
+                 + "<br>Fin: SD" + bar["end_sd"].astype(str) + " · "
+                 + pd.to_datetime(bar["fin_real"]).dt.strftime("%d/%m/%Y %H:%M")
+                 + "<br>Turno: " + bar["turno"].astype(str)
+                 + "<br>Criticidad: " + bar["criticidad"].astype(str)
+                 + " · RC Calc: " + bar["es_critica"].astype(str)
+                 + "<br>Score: " + bar["score"].round(3).astype(str))
+        titulo = f"📅 DIAGRAMA DE GANTT — {len(bar)} actividades"
+
+    # Eje x en milisegundos epoch y eje y por nº de fila: arreglos float compactos
+    t0  = pd.Timestamp(INICIO_SD)
+    ms  = lambda h: t0.value / 1e6 + np.asarray(h, dtype=float) * 3.6e6
+    ini, fin = ms(bar["start_sd"]), ms(bar["end_sd"])
+    orden = pd.unique(bar["y"])  # filas en el orden de aparición
+    fila  = pd.Index(orden).get_indexer(bar["y"]).astype(float)
+    ancho = float(np.clip(900 / max(len(orden), 1), 3, 14))
+
+    fig = go.Figure()
+    conocida = bar["criticidad"].isin(list(COLORES_CRITICIDAD)).to_numpy()
+    for crit, color in (*COLORES_CRITICIDAD.items(), (SIN_CLASIFICAR, COLOR_SIN_CLASIFICAR)):
+        m = ~conocida if crit == SIN_CLASIFICAR else (bar["criticidad"] == crit).to_numpy()
+        if m.any():
+            fig.add_trace(go.Scattergl(
+                x=_segmentos(ini[m], fin[m]), y=_segmentos(fila[m], fila[m]),
+                mode="lines", line=dict(color=color, width=ancho), name=crit, hoverinfo="skip"))
+    fig.add_trace(go.Scattergl(
+        x=(ini + fin) / 2, y=fila, mode="markers", hovertext=hover.to_numpy(), hoverinfo="text",
+        marker=dict(size=ancho, color="rgba(0,0,0,0)"), showlegend=False, name="detalle"))
+    if not agregada and bar["es_critica"].any():
+        rc = bar["es_critica"].to_numpy(dtype=bool)
+        fig.add_trace(go.Scattergl(
+            x=ini[rc], y=fila[rc], mode="markers", name="⭐ Ruta Crítica", hoverinfo="skip",
+            marker=dict(symbol="star", size=10, color="#FFD700", line=dict(color="white", width=1))))
+
+    # Franjas de turno alternas dentro de la ventana (como máximo 60)
+    t_h = [t for t in range(h0 - h0 % turno_h, h1, turno_h)][:60]
+    formas = [dict(type="rect", xref="x", yref="paper", layer="below", y0=0, y1=1, line=dict(width=0),
+                   x0=t0 + pd.Timedelta(hours=t), x1=t0 + pd.Timedelta(hours=t + turno_h),
+                   fillcolor="rgba(100,180,255,0.04)") for t in t_h if (t // turno_h) % 2]
+    if h0 <= horizonte <= h1:
+        formas.append(dict(type="line", xref="x", yref="paper", y0=0, y1=1,
+                           x0=t0 + pd.Timedelta(hours=horizonte), x1=t0 + pd.Timedelta(hours=horizonte),
+                           line=dict(color="#FF4444", width=2.5, dash="dash")))
 
-    fig = px.timeline(
-        df, x_start="inicio_real", x_end="fin_real", y="actividad",
-        color="criticidad", color_discrete_map=COLORES_CRITICIDAD,
-        custom_data=["centro","especialidad","ejecutor","duracion_h","start_sd","end_sd",
-                     "turno","ruta_critica","es_critica","score","criticidad_num",
-                     "riesgo_texto","valor_global","i_str","f_str","dentro_horizonte"],
-        template=T, title="📅 DIAGRAMA DE GANTT — PARADA DE PLANTA SD18MAR26",
+    fig.update_layout(
+        template=T, title=titulo, shapes=formas,
+        height=int(np.clip(len(orden) * 18 + 150, 450, 2400)),
+        xaxis=dict(type="date", title="Fecha / Hora Real", range=[ms(h0), ms(h1)]),
+        yaxis=dict(tickmode="array", tickvals=np.arange(len(orden)), ticktext=list(orden),
+                   range=[len(orden) - 0.5, -0.5], tickfont=dict(size=10), zeroline=False),
+        legend_title_text="Criticidad", legend=dict(orientation="h", y=1.02, x=0),
+        margin=dict(l=10, r=10, t=80, b=40), hovermode="closest",
+    )
+    return fig, agregada
+
+
+def plot_frente_pareto(frente: pd.DataFrame) -> go.Figure:
+    H = frente.attrs.get("horizonte", 36)
+    fig = px.scatter(
+        frente, x="makespan", y="avance_horizonte", color="fin_ponderado",
+        color_continuous_scale="Viridis_r", custom_data=list(PARAMETROS),
+        template=T, title=f"🎯 FRENTE DE PARETO — MAKESPAN · AVANCE @SD{H} · PRIORIDAD",
+        labels={"makespan": "Makespan (h)", "avance_horizonte": f"Avance @SD{H} (%)",
+                "fin_ponderado": "Fin medio ponderado (h)"},
     )
     fig.update_traces(
         hovertemplate=(
-            "<b>%{y}</b><br>"
-            "Centro: %{customdata[0]}<br>"
-            "Especialidad: %{customdata[1]}<br>"
-            "Ejecutor: %{customdata[2]}<br>"
-            "Duración: <b>%{customdata[3]}h</b><br>"
-            "Inicio: SD%{customdata[4]} · %{customdata[13]}<br>"
-            "Fin: SD%{customdata[5]} · %{customdata[14]}<br>"
-            "Turno: %{customdata[6]}<br>"
-            "Criticidad num: %{customdata[10]}<br>"
-            "Riesgo: %{customdata[11]}<br>"
-            "RC Orig: %{customdata[7]} · RC Calc: %{customdata[8]}<br>"
-            "Score: %{customdata[9]:.3f}<br>"
-            "Valor Global: %{customdata[12]:.5f}<br>"
-            "Dentro 36H: %{customdata[15]}<extra></extra>"
+            f"<b>Makespan: SD%{{x}}</b> · Avance @SD{H}: %{{y:.1f}}%<br>"
+            "Fin medio ponderado: %{marker.color:.1f}h<br>"
+            "w_crit %{customdata[0]:.2f} · w_riesgo %{customdata[1]:.2f} · "
+            "w_valor %{customdata[2]:.2f} · w_dur %{customdata[3]:.2f}<br>"
+            "Umbral no-solapamiento: %{customdata[4]}<extra></extra>"
         ),
-        marker_line_width=0.8, marker_line_color="rgba(255,255,255,0.4)", opacity=0.88,
+        marker=dict(size=13, line=dict(color="white", width=1)),
     )
+    fig.update_layout(height=480, margin=dict(l=10, r=10, t=60, b=40), clickmode="event+select")
+    return fig
 
-    # Estrellas de ruta crítica
-    df_rc = df[df["es_critica"] == True]
-    if len(df_rc):
-        fig.add_trace(go.Scatter(
-            x=df_rc["inicio_real"], y=df_rc["actividad"],
-            mode="markers",
-            marker=dict(symbol="star", size=10, color="#FFD700", line=dict(color="white", width=1)),
-            name="⭐ Ruta Crítica", hoverinfo="skip",
-        ))
-
-    t36_str = (INICIO_SD + timedelta(hours=36)).strftime("%Y-%m-%d %H:%M:%S")
-
-    # Línea 36H — usar add_shape en lugar de add_vline (compatible con todos los Plotly)
-    fig.add_shape(type="line", x0=t36_str, x1=t36_str, y0=0, y1=1,
-                  xref="x", yref="paper",
-                  line=dict(color="#FF4444", width=2.5, dash="dash"))
-    fig.add_annotation(x=t36_str, y=1.02, xref="x", yref="paper",
-                       text="← 36H →", showarrow=False,
-                       font=dict(color="#FF4444", size=12), xanchor="center")
-
-    # Franjas de turno (8h c/u)
-    for t in range(7):
-        x0_str = (INICIO_SD + timedelta(hours=t * 8)).strftime("%Y-%m-%d %H:%M:%S")
-        x1_str = (INICIO_SD + timedelta(hours=(t + 1) * 8)).strftime("%Y-%m-%d %H:%M:%S")
-        fig.add_shape(type="rect", x0=x0_str, x1=x1_str, y0=0, y1=1,
-                      xref="x", yref="paper", layer="below",
-                      fillcolor=["rgba(255,255,255,0.02)", "rgba(100,180,255,0.04)"][t % 2],
-                      line=dict(width=0))
-        fig.add_shape(type="line", x0=x0_str, x1=x0_str, y0=0, y1=1,
-                      xref="x", yref="paper",
-                      line=dict(color="rgba(150,150,150,0.15)", width=0.5))
 
-    fig.update_layout(
-        height=max(600, len(df) * 26 + 150),
-        xaxis_title="Fecha / Hora Real",
-        yaxis=dict(autorange="reversed", tickfont=dict(size=10)),
-        legend_title_text="Criticidad",
-        legend=dict(orientation="h", y=1.02, x=0),
-        margin=dict(l=10, r=10, t=80, b=40),
-        hovermode="closest",
-    )
+def plot_curva_s_bandas(bandas: pd.DataFrame, cs: pd.DataFrame) -> go.Figure:
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=bandas["hora_real"], y=bandas["avance_p90"], mode="lines",
+                             line=dict(width=0), hoverinfo="skip", showlegend=False))
+    fig.add_trace(go.Scatter(x=bandas["hora_real"], y=bandas["avance_p10"], mode="lines",
+                             line=dict(width=0), fill="tonexty", fillcolor="rgba(0,229,255,0.18)",
+                             name="Banda P10–P90"))
+    fig.add_trace(go.Scatter(x=bandas["hora_real"], y=bandas["avance_p50"], mode="lines",
+                             line=dict(color="#00E5FF", width=2.5), name="P50"))
+    fig.add_trace(go.Scatter(x=cs["hora_real"], y=cs["avance_acum"], mode="lines",
+                             line=dict(color="#FFD600", width=2, dash="dash"), name="Plan"))
+    fig.update_layout(template=T, height=420, title="📈 CURVA S PROBABILÍSTICA (MONTE CARLO)",
+                      xaxis_title="Fecha / Hora Real", yaxis_title="Avance acumulado (%)",
+                      hovermode="x unified", margin=dict(l=10, r=10, t=60, b=40))
     return fig
 
 
 
-# ─────────────────────────────────────────────────────────────────────────────
-# MÓDULO 6: EXPORTAR EXCEL
-# ─────────────────────────────────────────────────────────────────────────────
+def _memo_vista(espacio: str, vista, extra, construir):
+    """
+    Resultado de construir() memorizado en la sesión por (vista, extra). `vista`
+    es un objeto memorizado aguas arriba (MatrizTecnicos, bloques): se guarda
+    junto al resultado para que su id no se confunda con el de otro objeto.
+    """
+    memo  = st.session_state.setdefault(espacio, {})
+    clave = (id(vista), extra)
+    if clave not in memo or memo[clave][0] is not vista:
+        if len(memo) >= MatrizTecnicos.MAX_VISTAS:
+            memo.clear()
+        memo[clave] = (vista, construir())
+    return memo[clave][1]
+
+
+def _matriz_resaltada(vista: MatrizTecnicos, orden: str, filas: slice, horas: slice):
+    """
+    Página filas × horas de la vista con la OT `orden` resaltada: la máscara se
+    calcula vectorizada solo sobre la ventana visible, y el Styler se memoriza.
+    """
+    def construir():
+        pagina = vista.recorte(filas, horas)
+        if not orden:
+            return pagina.etiquetas()
+        css = np.where(pagina.resaltar(orden), "background-color: #FFD700", "")
+        return pagina.etiquetas().style.apply(lambda _: css, axis=None)
+    return _memo_vista("estilos_matriz", vista, (orden, filas.start, horas.start), construir)
+
+
+def _limitar_widget(clave: str, maximo: int):
+    """Recorta el valor guardado de un widget si el nuevo máximo quedó por debajo."""
+    if st.session_state.get(clave, 0) > maximo:
+        st.session_state[clave] = maximo
+
+
+@st.fragment
+def _panel_gantt(prog: pd.DataFrame, mksp: int, H: int, turno_h: int):
+    st.subheader("📅 Diagrama de Gantt")
+    cg1, cg2 = st.columns([4, 1])
+    ventana = cg1.slider("Ventana (horas SD)", 0, max(mksp, 1), (0, max(mksp, 1)), key="gantt_rango")
+    grupo = st.session_state.get("gantt_grupo")
+    if grupo and cg2.button("← Vista agregada", use_container_width=True):
+        st.session_state.pop("gantt_grupo")
+        st.rerun(scope="fragment")
+    fig_g, agregada = plot_gantt_escalable(prog, ventana, grupo, horizonte=H, turno_h=turno_h)
+    if agregada:
+        st.caption("Demasiadas actividades en la ventana: se muestra una fila por centro · "
+                   "especialidad. Acerca la ventana o haz clic en una fila para ver el detalle.")
+    elif grupo:
+        st.caption(f"Detalle de **{grupo}**.")
+    evento = st.plotly_chart(fig_g, use_container_width=True, key="gantt",
+                             on_select="rerun" if agregada else "ignore", selection_mode="points")
+    puntos = evento.selection.points if agregada and evento else []
+    if puntos and puntos[0].get("y") is not None:
+        elegido = fig_g.layout.yaxis.ticktext[int(round(puntos[0]["y"]))]
+        if elegido != grupo:
+            st.session_state["gantt_grupo"] = elegido
+            st.rerun(scope="fragment")
+
+
+@st.fragment
+def _panel_matriz(matriz_tecnicos: MatrizTecnicos, H: int):
+    # ── FILTROS EN STREAMLIT PARA MATRIZ DE TÉCNICOS ──
+    st.subheader("📅 Planificación de técnicos por hora")
+    st.caption(f"Cada fila es un técnico. Cada columna es una hora SD (0-{H}).")
+    
+    # Índices de centro / OT y vistas filtradas quedan memorizados en la matriz
+    filtro_centro = st.multiselect("Filtrar por Centro", matriz_tecnicos.lista_centros)
+    
+    ordenes_disponibles = matriz_tecnicos.opciones_orden()
+    filtro_orden = st.selectbox("Resaltar Orden de Trabajo", [""] + ordenes_disponibles)
+
+    vista = matriz_tecnicos.filtrar(filtro_centro)
+    n_tec, n_h = vista.shape
+    paginas = max(1, -(-n_tec // MATRIZ_FILAS_PAGINA))
+    cp1, cp2 = st.columns([1, 3])
+    _limitar_widget("matriz_pagina", paginas)
+    pagina = cp1.number_input("Página de técnicos", 1, paginas, 1, key="matriz_pagina",
+                              disabled=paginas == 1)
+    h0 = 0
+    if n_h > MATRIZ_HORAS_VISIBLES:
+        _limitar_widget("matriz_hora", n_h - MATRIZ_HORAS_VISIBLES)
+        h0 = cp2.slider("Desde la hora SD", 0, n_h - MATRIZ_HORAS_VISIBLES, 0, key="matriz_hora")
+    filas = slice((pagina - 1) * MATRIZ_FILAS_PAGINA, pagina * MATRIZ_FILAS_PAGINA)
+    horas = slice(h0, h0 + MATRIZ_HORAS_VISIBLES)
+    st.caption(f"Técnicos {filas.start + 1 if n_tec else 0}–{min(filas.stop, n_tec)} de {n_tec} · "
+               f"horas SD {h0}–{min(horas.stop, n_h) - 1}")
+    st.dataframe(_matriz_resaltada(vista, filtro_orden, filas, horas))
+
+
+@st.fragment
+def _panel_gantt_ot(matriz_tecnicos: MatrizTecnicos, centros: list):
+    st.subheader("📊 Gantt por Orden de Trabajo (por horas de técnicos)")
+    st.caption("Cada barra = horas trabajadas de una OT por técnico")
+    
+    # ── FILTROS ──
+    col1, col2 = st.columns(2)
+    ordenes = matriz_tecnicos.opciones_orden()
+    filtro_centro_gantt = col1.multiselect(
+        "Filtrar por Centro",
+        centros,
+        key="filtro_centro_gantt"
+    )
+    
+    filtro_ot_gantt = col2.selectbox(
+        "Seleccionar Orden de Trabajo",
+        ["Todas"] + ordenes,
+        key="filtro_ot_gantt"
+    )
+    
+    # ── APLICAR FILTROS (vista memorizada de la matriz y sus bloques) ──
+    bloques = matriz_tecnicos.filtrar(
+        filtro_centro_gantt, None if filtro_ot_gantt == "Todas" else filtro_ot_gantt).bloques()
 
-def exportar_excel(df: pd.DataFrame) -> bytes:
-    buf  = io.BytesIO()
-    cols = ["id","centro","actividad","orden","especialidad","ejecutor",
-            "criticidad","criticidad_num","riesgo_texto","riesgo_num",
-            "duracion_h","start_sd","end_sd","turno",
-            "valor_global","valor_global_norm","acum_centro_calc","acum_total_calc",
-            "ruta_critica","es_critica","dentro_horizonte","avance_pct","score","prioridad"]
-    df_e = df[[c for c in cols if c in df.columns]].copy()
-    for col in ["valor_global_norm","acum_centro_calc","acum_total_calc"]:
-        if col in df_e.columns:
-            df_e[col] = df_e[col].clip(upper=100).round(3)
-
-    ren = {"id":"ID","centro":"Centro","actividad":"Actividad","orden":"Orden SAP",
-           "especialidad":"Especialidad","ejecutor":"Ejecutor","criticidad":"Criticidad",
-           "criticidad_num":"Crit. Num","riesgo_texto":"Riesgo","riesgo_num":"Riesgo Num",
-           "duracion_h":"Duración (h)","start_sd":"Inicio SD","end_sd":"Fin SD","turno":"Turno",
-           "valor_global":"Valor Global","valor_global_norm":"Valor Global %",
-           "acum_centro_calc":"% Acum Centro","acum_total_calc":"% Acum Total",
-           "ruta_critica":"RC Orig","es_critica":"RC Calc",
-           "dentro_horizonte":"Dentro 36H","avance_pct":"Avance %",
-           "score":"Score","prioridad":"Prioridad"}
-    df_e = df_e.rename(columns={k:v for k,v in ren.items() if k in df_e.columns})
-
-    resumen = df.groupby("centro").agg(
-        N_Act=("id","count"), Horas=("duracion_h","sum"),
-        Criticas=("es_critica","sum"),
-        RC_Orig=("ruta_critica",lambda x:(x=="SI").sum()),
-        Makespan=("end_sd","max"),
-        Dentro_36H=("dentro_horizonte","sum"),
-        Valor_Pct=("valor_global_norm",lambda x:round(x.sum()*100,2)),
-    ).reset_index()
-    resumen["Pct_Cumpl"] = (resumen["Dentro_36H"]/resumen["N_Act"]*100).round(1)
-
-    metricas = pd.DataFrame({
-        "Métrica":["Total Actividades","RC (calc)","Makespan SD","Dentro 36H",
-                   "% Cumplimiento","Centro mayor carga","Inicio SD","Fin estimado","Horas totales"],
-        "Valor":[len(df), int(df["es_critica"].sum()), int(df["end_sd"].max()),
-                 int(df["dentro_horizonte"].sum()),
-                 f"{df['dentro_horizonte'].mean()*100:.1f}%",
-                 df.groupby("centro")["duracion_h"].sum().idxmax(),
-                 "18/03/2026 06:00",
-                 (INICIO_SD+timedelta(hours=int(df["end_sd"].max()))).strftime("%d/%m/%Y %H:%M"),
-                 int(df["duracion_h"].sum())]
-    })
-
-    with pd.ExcelWriter(buf, engine="openpyxl") as w:
-        df_e.to_excel(w, sheet_name="Cronograma", index=False)
-        resumen.to_excel(w, sheet_name="Resumen Centro", index=False)
-        metricas.to_excel(w, sheet_name="Métricas", index=False)
-        df_rc = df[df.get("es_critica", pd.Series([False]*len(df))) == True] if "es_critica" in df.columns else pd.DataFrame()
-        if not df_rc.empty:
-            df_rc[[c for c in cols if c in df_rc.columns]].rename(columns=ren).to_excel(w, sheet_name="Ruta Crítica", index=False)
-
-    buf.seek(0)
-    return buf.read()
+    if bloques.empty:
+        st.warning("⚠️ No hay actividades para los filtros seleccionados")
+    else:
+        st.plotly_chart(
+            _memo_vista("figuras_gantt_ot", bloques, None, lambda: plot_gantt_ot_turnos(bloques)),
+            use_container_width=True
+        )
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -780,6 +465,9 @@ def main():
         st.markdown("### 📂 Archivos Excel")
         f_act = st.file_uploader("1. Listado de Actividades", type=["xlsx"], key="fa")
         f_pdt = st.file_uploader("2. PDT Paro de Bombeo",     type=["xlsx"], key="fp")
+        f_pes = st.file_uploader("3. Pesos por especialidad (opcional)", type=["csv", "xlsx"], key="fw",
+                                 help="Columnas: conjunto, especialidad, peso. Los conjuntos no "
+                                      "listados reparten las horas en partes iguales.")
         st.markdown("---")
         st.markdown("### 🎯 Pesos Función Objetivo")
         w_crit   = st.slider("⭐ Criticidad",    0.0, 1.0, 0.40, 0.05)
@@ -792,7 +480,29 @@ def main():
         st.markdown("### 🔧 Restricciones")
         riesgo_thr = st.slider("Umbral criticidad no-solapamiento", 2, 5, 3)
         st.markdown("---")
+        st.markdown("### 📆 Calendario de Turnos")
+        horizonte = st.number_input("Horizonte (h)", 8, 24 * 21, 36, 12)
+        c_tu, c_de = st.columns(2)
+        dur_turno = c_tu.selectbox("Turno (h)", [8, 12])
+        descanso  = c_de.number_input("Descanso (h)", 0, 48, 16 if dur_turno == 8 else 12)
+        resolucion = st.select_slider("Paso de la curva S (h)", [0.25, 0.5, 1.0, 2.0, 4.0], 1.0,
+                                      help="0.25 = cubos de 15 min; también se usa en las bandas "
+                                           "del Monte Carlo.")
+        st.markdown("---")
+        st.markdown("### 🧮 Motor de Programación")
+        motor = st.radio("Motor", ["Greedy", "CP-SAT (exacto)"], horizontal=True,
+                         label_visibility="collapsed")
+        t_lim = st.slider("Tiempo límite CP-SAT (s)", 5, 300, 30, 5, disabled=motor == "Greedy")
+        st.markdown("---")
         ejecutar = st.button("▶  EJECUTAR SIMULACIÓN", type="primary", use_container_width=True)
+        st.markdown("### 🔄 Re-plan durante la parada")
+        ahora = st.number_input("Hora actual (SD)", 0, 24 * 21, 0, 1,
+                                help="Sube el PDT con el avance actualizado: terminadas y en curso "
+                                     "quedan fijas y el resto se re-programa desde esta hora.")
+        escala_avance = st.radio("Avance en el PDT", list(ESCALAS_AVANCE), horizontal=True,
+                                 format_func={"porcentaje": "0-100", "fraccion": "0-1 (formato %)"}.get)
+        replan = st.button("⟳ RE-PLANIFICAR DESDE AHORA", use_container_width=True,
+                           disabled="programa" not in st.session_state)
 
     # ── VALIDACIÓN ──
     if not f_act or not f_pdt:
@@ -806,119 +516,170 @@ def main():
     if ejecutar or "cron" not in st.session_state:
         with st.spinner("⚙️ Ejecutando modelo de optimización..."):
             try:
-                dfa    = cargar_actividades(f_act.read())
-                dfp    = cargar_pdt(f_pdt.read())
-                m      = limpiar_unificar(dfa, dfp)
-                m      = scoring(m, w_crit, w_riesgo, w_valor, w_dur)
-                cron   = programar(m, 51, riesgo_thr)
-                cs     = curva_s(cron, 51)
-                df_tecnicos_ot  = tecnicos_por_ot(cron)
-                cron = dividir_especialidades(cron)
-                matriz_tecnicos = optimizar_tecnicos_turnos(cron)          
-                st.session_state.update({"cron": cron, "cs": cs, "tecnicos_ot": df_tecnicos_ot, "cron":cron, "matriz_tecnicos": matriz_tecnicos})
+                if "etapas" not in st.session_state:
+                    st.session_state["etapas"] = CacheEtapas()
+                st.session_state.pop("params_pareto", None)
+                st.session_state.pop("barrido", None)
+                st.session_state.pop("frente", None)
+                st.session_state.pop("riesgo", None)
+                st.session_state.pop("exportacion", None)
+                st.session_state["pesos_esp"] = (
+                    leer_tabla_pesos(io.BytesIO(f_pes.getvalue()), f_pes.name) if f_pes else None)
+                st.session_state["calendario"] = CalendarioTurnos(int(horizonte), dur_turno, int(descanso))
+                st.session_state["resolucion"] = float(resolucion)
+                st.session_state.update(ejecutar_pipeline(
+                    f_act.getvalue(), f_pdt.getvalue(), w_crit, w_riesgo, w_valor, w_dur,
+                    riesgo_thr, motor, t_lim, st.session_state["etapas"],
+                    st.session_state["pesos_esp"], st.session_state["calendario"],
+                    st.session_state["resolucion"]))
             except Exception as e:
                 st.error(f"❌ Error: {e}")
                 st.exception(e)
                 return
         st.success("✅ Simulación completada")
+    elif replan:
+        with st.spinner("🔄 Re-planificando desde la hora actual..."):
+            try:
+                st.session_state.pop("riesgo", None)
+                st.session_state.pop("exportacion", None)
+                st.session_state.update(ejecutar_replan(
+                    f_pdt.getvalue(), st.session_state["programa"], int(ahora), riesgo_thr,
+                    st.session_state["etapas"], st.session_state.get("pesos_esp"),
+                    st.session_state["calendario"], escala_avance, st.session_state["resolucion"]))
+            except Exception as e:
+                st.error(f"❌ Error: {e}")
+                st.exception(e)
+                return
+        st.success(f"✅ Re-plan desde SD{int(ahora)} completado")
 
-    cron = st.session_state["cron"]
     cs   = st.session_state["cs"]
     df_tecnicos_ot = st.session_state["tecnicos_ot"]
-    cron = st.session_state["cron"]
     matriz_tecnicos = st.session_state["matriz_tecnicos"]
+    H = st.session_state["calendario"].horizonte
 
 
-    # ── KPIs ──
-    mksp  = int(cron["end_sd"].max())
-    n_tot = len(cron)
-    n_cr  = int(cron["es_critica"].sum())
-    pct36 = cron["dentro_horizonte"].mean() * 100
-    av36  = float(np.interp(36, cs["hora_sd"], cs["avance_acum"]))
-    fin_dt = INICIO_SD + timedelta(hours=mksp)
+    # ── KPIs (calculados una vez por programa en el pipeline) ──
+    kpis  = st.session_state["kpis"]
+    mksp  = kpis["makespan"]
+    n_tot = kpis["n_act"]
+    n_cr  = kpis["n_criticas"]
+    pct36 = kpis["pct_dentro"]
+    av36  = float(np.interp(H, cs["hora_sd"], cs["avance_acum"]))
+    fin_dt = kpis["fin"]
 
     c1,c2,c3,c4,c5,c6 = st.columns(6)
     c1.metric("📋 Actividades", n_tot)
-    c2.metric("⏱️ Makespan", f"SD{mksp}", f"{'✅ En 36H' if mksp<=36 else f'⚠️ +{mksp-36}H'}")
+    c2.metric("⏱️ Makespan", f"SD{mksp}", f"{f'✅ En {H}H' if mksp<=H else f'⚠️ +{mksp-H}H'}")
     c3.metric("⭐ Ruta Crítica", n_cr)
-    c4.metric("🎯 Cumpl. 36H", f"{pct36:.0f}%", f"{int(cron['dentro_horizonte'].sum())}/{n_tot}")
-    c5.metric("📈 Avance @SD36", f"{av36:.1f}%")
+    c4.metric(f"🎯 Cumpl. {H}H", f"{pct36:.0f}%", f"{kpis['n_dentro']}/{n_tot}")
+    c5.metric(f"📈 Avance @SD{H}", f"{av36:.1f}%")
     c6.metric("🏁 Fin Estimado", fin_dt.strftime("%d/%m %H:%M"))
     st.caption(
         f"📅 **Inicio:** 18/03/2026 06:00 &nbsp;·&nbsp; "
         f"**Fin:** {fin_dt.strftime('%d/%m/%Y %H:%M')} &nbsp;·&nbsp; "
-        f"**Centros:** {cron['centro'].nunique()} &nbsp;·&nbsp; "
-        f"**Horas acumuladas:** {int(cron['duracion_h'].sum())}h"
+        f"**Centros:** {kpis['n_centros']} &nbsp;·&nbsp; "
+        f"**Horas acumuladas:** {int(kpis['horas'])}h &nbsp;·&nbsp; "
+        f"**Motor:** {st.session_state.get('motor', 'Greedy')}"
     )
+
+    with st.expander("🔬 Barrido de pesos (evaluación en lote)"):
+        st.caption("Evalúa combinaciones aleatorias de pesos y umbral sobre los datos ya cargados "
+                   f"y las ordena por makespan, avance @SD{H}, % dentro de {H}H, nº de críticas y "
+                   "técnicos requeridos, con el calendario y la tabla de pesos de la barra lateral.")
+        cb1, cb2 = st.columns([3, 1])
+        n_barrido = cb1.number_input("Combinaciones", 10, 5000, 200, 10)
+        if cb2.button("Ejecutar barrido", use_container_width=True):
+            with st.spinner("🔬 Evaluando combinaciones..."):
+                st.session_state["barrido"] = barrido_parametros(
+                    st.session_state["limpio"], muestras_pesos(int(n_barrido)),
+                    calendario=st.session_state["calendario"],
+                    pesos_esp=st.session_state.get("pesos_esp"))
+        if "barrido" in st.session_state:
+            st.dataframe(st.session_state["barrido"], hide_index=True, use_container_width=True,
+                         column_config={"pct_horizonte": f"% dentro {H}H",
+                                        "avance_horizonte": f"Avance @SD{H} (%)"})
+
+    with st.expander(f"🎯 Frente de Pareto (makespan · prioridad · avance @SD{H})"):
+        st.caption("Búsqueda evolutiva sobre pesos y umbral; se conservan solo los programas no "
+                   "dominados. Prioridad = fin medio ponderado por criticidad (menor es mejor).")
+        cp1, cp2, cp3 = st.columns([2, 2, 1])
+        n_gen = cp1.number_input("Generaciones", 1, 100, 8)
+        n_pob = cp2.number_input("Población por generación", 8, 1000, 32, 8)
+        if cp3.button("Buscar frente", use_container_width=True):
+            with st.spinner("🎯 Explorando combinaciones..."):
+                st.session_state["frente"] = frente_pareto(
+                    st.session_state["limpio"], int(n_gen), int(n_pob),
+                    calendario=st.session_state["calendario"],
+                    pesos_esp=st.session_state.get("pesos_esp"))
+        if "frente" in st.session_state:
+            frente = st.session_state["frente"]
+            evento = st.plotly_chart(plot_frente_pareto(frente), use_container_width=True,
+                                     on_select="rerun", selection_mode="points", key="sel_pareto")
+            st.caption("🖱️ Haz clic en un punto para cargar ese programa en el dashboard.")
+            puntos = evento.selection.points if evento else []
+            if puntos:
+                p = frente.iloc[puntos[0]["point_index"]]
+                params = {k: (int(p[k]) if k == "riesgo_thr" else float(p[k])) for k in PARAMETROS}
+                if params != st.session_state.get("params_pareto"):
+                    st.session_state["params_pareto"] = params
+                    st.session_state.update(ejecutar_pipeline(
+                        f_act.getvalue(), f_pdt.getvalue(), **params,
+                        cache=st.session_state["etapas"], pesos_esp=st.session_state.get("pesos_esp"),
+                        calendario=st.session_state.get("calendario"),
+                        resolucion=st.session_state.get("resolucion", 1.0)))
+                    st.session_state["motor"] = "Greedy · punto del frente de Pareto"
+                    st.session_state.pop("riesgo", None)
+                    st.session_state.pop("exportacion", None)
+                    st.rerun()
+
+    with st.expander("🎲 Riesgo de duración (Monte Carlo · P50 / P80 / P90)"):
+        st.caption("Muestrea duraciones triangulares según riesgo del entorno y criticidad y "
+                   "re-evalúa el programa con su orden fijo: los atrasos se propagan por "
+                   "precedencias, especialidad y centro.")
+        cm1, cm2 = st.columns([3, 1])
+        n_esc = cm1.number_input("Escenarios", 100, 50000, 2000, 500)
+        if cm2.button("Simular riesgo", use_container_width=True):
+            with st.spinner("🎲 Simulando escenarios..."):
+                st.session_state["riesgo"] = simular_riesgo(
+                    st.session_state["programa"], int(n_esc), riesgo_thr,
+                    resolucion=st.session_state.get("resolucion", 1.0))
+        if "riesgo" in st.session_state:
+            riesgo = st.session_state["riesgo"]
+            for col, (_, r) in zip(st.columns(len(riesgo["resumen"])), riesgo["resumen"].iterrows()):
+                col.metric(f"🏁 Fin {r['percentil']}", r["fin"].strftime("%d/%m %H:%M"),
+                           f"SD{r['makespan_h']:.1f} · {r['makespan_h'] - mksp:+.1f}h vs plan",
+                           delta_color="inverse")
+            st.plotly_chart(plot_curva_s_bandas(riesgo["bandas"], cs), use_container_width=True)
+
+    with st.expander("💾 Exportar resultados"):
+        st.caption("Cronograma, resumen por centro, métricas, ruta crítica, técnicos por hora y "
+                   "curva S. El Excel se escribe fila a fila; CSV y Parquet van en un .zip, un "
+                   "archivo por hoja.")
+        ce1, ce2 = st.columns([3, 1])
+        formato = ce1.radio("Formato", list(FORMATOS_EXPORTACION), horizontal=True,
+                            label_visibility="collapsed")
+        if ce2.button("Preparar archivo", use_container_width=True):
+            with st.spinner("💾 Generando archivo..."):
+                hojas = (st.session_state["programa"], matriz_tecnicos, cs)
+                st.session_state["exportacion"] = (formato, (
+                    exportar_excel(*hojas, kpis=kpis) if formato.startswith("Excel")
+                    else exportar_tablas(*hojas, "csv" if formato.startswith("CSV") else "parquet",
+                                         kpis=kpis)))
+        if st.session_state.get("exportacion", (None,))[0] == formato:
+            archivo, mime = FORMATOS_EXPORTACION[formato]
+            st.download_button(f"⬇️ Descargar {archivo}", st.session_state["exportacion"][1],
+                               archivo, mime, use_container_width=True)
+    st.markdown("---")
+
+    # ── PANELES (fragmentos: cada uno se re-ejecuta solo al tocar sus propios widgets) ──
+    _panel_gantt(st.session_state["programa"], mksp, H, st.session_state["calendario"].duracion_turno)
     st.markdown("---")
 
     st.subheader("👷 Técnicos requeridos por Orden de Trabajo")
     st.dataframe(df_tecnicos_ot)
 
-    # ── FILTROS EN STREAMLIT PARA MATRIZ DE TÉCNICOS ──
-    st.subheader("📅 Planificación de técnicos por hora")
-    st.caption("Cada fila es un técnico. Cada columna es una hora SD (0-36).")
-    
-    centros_disponibles = sorted(matriz_tecnicos.index.str.split("_").str[0].unique())
-    filtro_centro = st.multiselect("Filtrar por Centro", centros_disponibles)
-    
-    ordenes_disponibles = sorted(cron["orden"].dropna().astype(str).unique())
-    filtro_orden = st.selectbox("Resaltar Orden de Trabajo", [""] + ordenes_disponibles)
-
-    matriz_filtrada = matriz_tecnicos.copy()
-    if filtro_centro:
-        matriz_filtrada = matriz_filtrada[
-           matriz_filtrada.index.str.split("_").str[0].isin(filtro_centro)
-    ]
-
-    def highlight_ot(val):
-        val_str = str(val)  # Convertimos todo a string
-        if filtro_orden and filtro_orden in val_str:
-            return "background-color: #FFD700"
-        return ""
-
-    st.dataframe(matriz_filtrada.style.applymap(highlight_ot))
-
-    st.subheader("📊 Gantt por Orden de Trabajo (por horas de técnicos)")
-    st.caption("Cada barra = horas trabajadas de una OT por técnico")
-    
-    # ── FILTROS ──
-    col1, col2 = st.columns(2)
-    centros = sorted(cron["centro"].unique())
-    ordenes = sorted(cron["orden"].astype(str).unique())
-    filtro_centro_gantt = col1.multiselect(
-        "Filtrar por Centro",
-        centros,
-        key="filtro_centro_gantt"
-    )
-    
-    filtro_ot_gantt = col2.selectbox(
-        "Seleccionar Orden de Trabajo",
-        ["Todas"] + ordenes,
-        key="filtro_ot_gantt"
-    )
-    
-    # ── APLICAR FILTROS ──
-    matriz_filtrada = matriz_tecnicos.copy()
-    
-    if filtro_ot_gantt != "Todas":
-        matriz_filtrada = matriz_filtrada.applymap(
-           lambda x: x if str(x) == filtro_ot_gantt else ""
-        )
-    if filtro_centro_gantt:
-        matriz_filtrada = matriz_filtrada[
-           matriz_filtrada.index.str.split("_").str[0].isin(filtro_centro_gantt)
-        ]
-    
-        
-    if matriz_filtrada.replace("", pd.NA).dropna(how="all").empty:
-        st.warning("⚠️ No hay actividades para los filtros seleccionados")
-    else:
-        st.plotly_chart(
-            plot_gantt_ot_turnos(matriz_filtrada),
-            use_container_width=True
-        )
-
+    _panel_matriz(matriz_tecnicos, H)
+    _panel_gantt_ot(matriz_tecnicos, kpis["por_centro"]["centro"].tolist())
 
 
 if __name__ == "__main__":
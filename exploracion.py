@@ -0,0 +1,363 @@
+"""
+=============================================================================
+SIMULACIÓN PARADA DE PLANTA SD18MAR26 - EXPLORACIÓN DE PARÁMETROS
+Evalúa muchas combinaciones de pesos / riesgo_thr en paralelo sobre el mismo
+DataFrame limpio (scoring → programar → curva_s): barrido ordenado por KPI y
+búsqueda evolutiva del frente de Pareto makespan / prioridad / avance al cierre
+del horizonte del calendario.
+Riesgo Monte Carlo: miles de escenarios de duración sobre un programa fijo.
+=============================================================================
+"""
+
+import heapq
+import itertools
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from simulacion import (INICIO_SD, CalendarioTurnos, curva_s, curva_s_lote, programar,
+                        compilar_pesos, red_precedencias, repartir_horas, scoring)
+
+PARAMETROS = ("w_crit", "w_riesgo", "w_valor", "w_dur", "riesgo_thr")
+
+# Incertidumbre de duración: triangular (mín, moda, máx) como múltiplo de duracion_h
+# según Riesgo Entorno; la criticidad alta (>= 4) alarga la cola superior.
+DISTRIBUCION_DURACION = {
+    1: (0.90, 1.00, 1.20),
+    2: (0.90, 1.00, 1.35),
+    3: (0.85, 1.05, 1.50),
+    4: (0.85, 1.10, 1.80),
+}
+COLA_CRITICIDAD = 1.15
+
+# DataFrame limpio, calendario y tabla de pesos por especialidad del proceso
+# trabajador: se envían una vez al crear el pool
+_LIMPIO = None
+_CALENDARIO = None
+_PESOS_ESP = None
+
+
+def _iniciar_trabajador(limpio: pd.DataFrame, calendario: CalendarioTurnos = None,
+                        pesos_esp: dict = None):
+    global _LIMPIO, _CALENDARIO, _PESOS_ESP
+    _LIMPIO, _CALENDARIO, _PESOS_ESP = limpio, calendario, pesos_esp
+
+
+def evaluar_parametros(limpio: pd.DataFrame, w_crit, w_riesgo, w_valor, w_dur, riesgo_thr,
+                       calendario: CalendarioTurnos = None, pesos_esp: dict = None) -> dict:
+    """
+    KPIs de una corrida scoring → programar → curva_s con el mismo calendario y
+    tabla de pesos que ejecutar_pipeline(); los KPIs "al horizonte" se miden en
+    calendario.horizonte.
+    """
+    calendario = calendario or CalendarioTurnos()
+    H    = calendario.horizonte
+    cron = programar(scoring(limpio, w_crit, w_riesgo, w_valor, w_dur), riesgo_thr=riesgo_thr,
+                     calendario=calendario)
+    cs   = curva_s(cron, H)
+    peso = cron["criticidad_num"].clip(lower=1)
+    return {
+        "makespan":   int(cron["end_sd"].max()),
+        # fin medio ponderado por criticidad: cuánto esperan las actividades importantes
+        "fin_ponderado": round(float((peso * cron["end_sd"]).sum() / peso.sum()), 2),
+        "pct_horizonte":    round(float((cron["end_sd"] <= H).mean() * 100), 1),
+        "avance_horizonte": round(float(cs["avance_acum"].iloc[-1]), 2),
+        "n_criticas": int(cron["es_critica"].sum()),
+        # técnicos-turno que pide el reparto por especialidad con la tabla de pesos
+        "tecnicos_req": int(repartir_horas(cron, compilar_pesos(pesos_esp))[1]["Tecnicos_Requeridos"].sum()),
+    }
+
+
+def _evaluar(params: dict) -> dict:
+    return {**params, **evaluar_parametros(_LIMPIO, **params, calendario=_CALENDARIO,
+                                           pesos_esp=_PESOS_ESP)}
+
+
+def malla_pesos(w_crit=(0.2, 0.4, 0.6), w_riesgo=(0.1, 0.3, 0.5), w_valor=(0.0, 0.2, 0.4),
+                w_dur=(0.0, 0.1, 0.2), riesgo_thr=(3,)) -> list:
+    """Producto cartesiano de los valores de cada parámetro."""
+    return [dict(zip(PARAMETROS, v))
+            for v in itertools.product(w_crit, w_riesgo, w_valor, w_dur, riesgo_thr)]
+
+
+def muestras_pesos(n: int, riesgo_thr=(2, 3, 4, 5), semilla: int = 0) -> list:
+    """Muestra aleatoria: criticidad/riesgo/valor suman 1 (Dirichlet), w_dur en [0, 0.5]."""
+    rng = np.random.default_rng(semilla)
+    w   = rng.dirichlet(np.ones(3), n).round(3)
+    dur = rng.uniform(0, 0.5, n).round(3)
+    thr = rng.choice(riesgo_thr, n)
+    return [dict(zip(PARAMETROS, (*map(float, w[i]), float(dur[i]), int(thr[i]))))
+            for i in range(n)]
+
+
+KPIS = ("makespan", "fin_ponderado", "pct_horizonte", "avance_horizonte", "n_criticas", "tecnicos_req")
+
+
+@contextmanager
+def _evaluador(limpio: pd.DataFrame, n_procesos: int = None,
+               calendario: CalendarioTurnos = None, pesos_esp: dict = None):
+    """Función lote → filas; con varios procesos reutiliza un único pool."""
+    n_procesos = n_procesos or os.cpu_count() or 1
+    if n_procesos == 1:
+        _iniciar_trabajador(limpio, calendario, pesos_esp)
+        yield lambda lote: [_evaluar(c) for c in lote]
+        return
+    # spawn: el servidor de Streamlit tiene hilos y fork no es seguro ahí
+    with ProcessPoolExecutor(max_workers=n_procesos, mp_context=mp.get_context("spawn"),
+                             initializer=_iniciar_trabajador,
+                             initargs=(limpio, calendario, pesos_esp)) as ex:
+        yield lambda lote: list(ex.map(_evaluar, lote,
+                                       chunksize=max(1, len(lote) // (4 * n_procesos))))
+
+
+def barrido_parametros(limpio: pd.DataFrame, combinaciones: list, n_procesos: int = None,
+                       calendario: CalendarioTurnos = None, pesos_esp: dict = None) -> pd.DataFrame:
+    """
+    Evalúa cada combinación en un pool de procesos y devuelve la tabla ordenada
+    (menor makespan, luego mayor avance y % dentro del horizonte del calendario,
+    menos críticas, menos técnicos). attrs["horizonte"] guarda ese horizonte.
+    """
+    calendario = calendario or CalendarioTurnos()
+    with _evaluador(limpio, n_procesos if len(combinaciones) > 1 else 1,
+                    calendario, pesos_esp) as evaluar:
+        filas = evaluar(combinaciones)
+
+    res = pd.DataFrame(filas, columns=[*PARAMETROS, *KPIS])
+    res = res.sort_values(["makespan", "avance_horizonte", "pct_horizonte", "n_criticas", "tecnicos_req"],
+                          ascending=[True, False, False, True, True]).reset_index(drop=True)
+    res.insert(0, "ranking", np.arange(1, len(res) + 1))
+    res.attrs["horizonte"] = calendario.horizonte
+    return res
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FRENTE DE PARETO
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _objetivos(df: pd.DataFrame) -> np.ndarray:
+    """Todos a minimizar: makespan, fin ponderado por criticidad, -avance al horizonte."""
+    return np.column_stack([df["makespan"], df["fin_ponderado"], -df["avance_horizonte"]]).astype(float)
+
+
+def no_dominados(obj: np.ndarray) -> np.ndarray:
+    """Máscara de los puntos que ningún otro iguala o mejora en todos los objetivos."""
+    peor_o_igual = (obj[:, None, :] <= obj[None, :, :]).all(-1)
+    estricto     = (obj[:, None, :] <  obj[None, :, :]).any(-1)
+    return ~(peor_o_igual & estricto).any(0)
+
+
+def _mutar(p: dict, rng: np.random.Generator, sigma: float) -> dict:
+    w = np.clip([p["w_crit"], p["w_riesgo"], p["w_valor"]] + rng.normal(0, sigma, 3), 0, 1)
+    w = w / w.sum() if w.sum() > 0 else np.full(3, 1 / 3)
+    thr = int(np.clip(p["riesgo_thr"] + rng.choice([-1, 0, 0, 0, 1]), 2, 5))
+    return dict(zip(PARAMETROS, (*map(float, w.round(3)),
+                                 float(np.clip(p["w_dur"] + rng.normal(0, sigma / 2), 0, 0.5).round(3)),
+                                 thr)))
+
+
+def frente_pareto(limpio: pd.DataFrame, generaciones: int = 8, poblacion: int = 32,
+                  sigma: float = 0.15, n_procesos: int = None, semilla: int = 0,
+                  calendario: CalendarioTurnos = None, pesos_esp: dict = None) -> pd.DataFrame:
+    """
+    Búsqueda evolutiva sobre pesos y umbral: parte de una muestra aleatoria y en
+    cada generación muta miembros del archivo no dominado; cada lote se evalúa en
+    el mismo pool de procesos. Devuelve el archivo final (frente de Pareto) con
+    sus parámetros y KPIs, ordenado por makespan. Con el mismo `calendario` y
+    `pesos_esp`, ejecutar_pipeline() reproduce los KPIs de cada punto.
+    """
+    calendario = calendario or CalendarioTurnos()
+    rng   = np.random.default_rng(semilla)
+    vistos = set()
+    archivo = pd.DataFrame(columns=[*PARAMETROS, *KPIS])
+    lote  = muestras_pesos(poblacion, semilla=semilla)
+
+    with _evaluador(limpio, n_procesos, calendario, pesos_esp) as evaluar:
+        for _ in range(generaciones):
+            lote = [p for p in lote if tuple(p.values()) not in vistos]
+            vistos.update(tuple(p.values()) for p in lote)
+            if lote:
+                nuevos  = pd.DataFrame(evaluar(lote), columns=archivo.columns)
+                archivo = pd.concat([archivo, nuevos], ignore_index=True) if len(archivo) else nuevos
+                archivo = archivo[no_dominados(_objetivos(archivo))]
+                archivo = archivo.drop_duplicates(subset=["makespan", "fin_ponderado", "avance_horizonte"])
+                archivo = archivo.reset_index(drop=True)
+
+            padres = archivo[list(PARAMETROS)].to_dict("records")
+            lote   = [_mutar(padres[i], rng, sigma) for i in rng.integers(0, len(padres), poblacion)]
+
+    archivo = archivo.sort_values(["makespan", "fin_ponderado"]).reset_index(drop=True)
+    archivo.attrs["horizonte"] = calendario.horizonte
+    return archivo
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RIESGO MONTE CARLO
+# ─────────────────────────────────────────────────────────────────────────────
+
+ESCENARIOS_POR_LOTE = 250
+
+# Modelo de riesgo del proceso trabajador: se envía una vez al crear el pool
+_MODELO = None
+
+
+def _iniciar_riesgo(modelo: dict):
+    global _MODELO
+    _MODELO = modelo
+
+
+def _carriles(inicio: np.ndarray, fin: np.ndarray, grupo: np.ndarray) -> np.ndarray:
+    """Arcos (anterior, siguiente) entre actividades que el programa pone en el mismo carril."""
+    arcos = []
+    for g in np.unique(grupo):
+        idx = np.flatnonzero(grupo == g)
+        idx = idx[np.lexsort((idx, inicio[idx]))]
+        libres = []  # heap (fin, carril): carriles ocupados
+        ultima = []
+        for i in idx:
+            if libres and libres[0][0] <= inicio[i]:
+                _, k = heapq.heappop(libres)
+                arcos.append((ultima[k], i))
+                ultima[k] = i
+            else:
+                k = len(ultima)
+                ultima.append(i)
+            heapq.heappush(libres, (fin[i], k))
+    return np.array(arcos, dtype=np.int64).reshape(-1, 2)
+
+
+def modelo_riesgo(prog: pd.DataFrame, riesgo_thr=4, distribucion: dict = None) -> dict:
+    """
+    Red de ejecución del programa con el orden fijo: precedencias del PDT, más
+    arcos entre actividades consecutivas del mismo carril de especialidad
+    (partición de intervalos del programa, una por unidad de capacidad usada) y
+    del mismo centro entre las de criticidad >= riesgo_thr. Cada actividad
+    arranca al terminar su última antecesora, nunca antes de su inicio
+    programado: con las duraciones del plan se reproduce el plan, y los atrasos
+    se propagan por la red. Los niveles topológicos se precalculan para evaluar
+    todos los escenarios de un lote con operaciones vectorizadas. En un re-plan
+    (prog.attrs["ahora"]) solo es incierto lo que falta: de las EN CURSO se
+    muestrea fin - max(inicio, ahora) y lo ya ejecutado queda fijo.
+    """
+    distribucion = distribucion or DISTRIBUCION_DURACION
+    df  = prog.sort_index()
+    n   = len(df)
+    ini = df["start_sd"].to_numpy(dtype=np.int64)
+    fin = df["end_sd"].to_numpy(dtype=np.int64)
+
+    indptr, suc = red_precedencias(df)
+    arcos = [np.column_stack([np.repeat(np.arange(n), np.diff(indptr)), suc]),
+             _carriles(ini, fin, pd.factorize(df["especialidad"].astype(str).str[:25])[0])]
+    alto = np.flatnonzero((df["criticidad_num"] >= riesgo_thr).to_numpy())
+    arcos.append(alto[_carriles(ini[alto], fin[alto], pd.factorize(df["centro"])[0][alto])])
+    arcos = np.unique(np.concatenate(arcos), axis=0)
+    origen, destino = arcos[:, 0], arcos[:, 1]
+
+    # Niveles topológicos (Kahn) y los arcos que salen de cada uno
+    pendientes = np.bincount(destino, minlength=n)
+    orden = np.argsort(origen, kind="stable")
+    origen, destino = origen[orden], destino[orden]
+    ptr = np.concatenate(([0], np.cumsum(np.bincount(origen, minlength=n))))
+    niveles, frente = [], np.flatnonzero(pendientes == 0)
+    while len(frente):
+        cuenta = ptr[frente + 1] - ptr[frente]
+        sel = np.repeat(ptr[frente] - (np.cumsum(cuenta) - cuenta), cuenta) + np.arange(int(cuenta.sum()))
+        niveles.append((frente, origen[sel], destino[sel]))
+        np.subtract.at(pendientes, destino[sel], 1)
+        nuevos = np.unique(destino[sel])
+        frente = nuevos[pendientes[nuevos] == 0]
+
+    riesgo = df["riesgo_num"].clip(1, max(distribucion)).astype(int).to_numpy()
+    tri    = np.array([distribucion.get(r, distribucion[max(distribucion)]) for r in riesgo])
+    tri[:, 2] *= np.where(df["criticidad_num"].to_numpy() >= 4, COLA_CRITICIDAD, 1.0)
+    if "estado_replan" in df:  # lo ya terminado no tiene incertidumbre
+        tri[(df["estado_replan"] == "TERMINADA").to_numpy()] = 1.0
+    dur   = (fin - ini).astype(float)  # duración programada
+    hecho = np.zeros(n)                 # horas ya ejecutadas, sin incertidumbre
+    ahora = prog.attrs.get("ahora")
+    if "estado_replan" in df and ahora is not None:
+        curso = (df["estado_replan"] == "EN CURSO").to_numpy()
+        hecho[curso] = np.clip(ahora - ini[curso], 0, dur[curso])
+    falta = dur - hecho
+
+    vg  = df["valor_global"].to_numpy(dtype=float)
+    vgn = vg / vg.sum() if vg.sum() > 0 else np.full(n, 1 / max(n, 1))
+    return {"inicio": ini.astype(float), "niveles": niveles, "fin_plan": int(fin.max(initial=0)),
+            "min": hecho + falta * tri[:, 0], "moda": hecho + falta * tri[:, 1],
+            "max": hecho + falta * tri[:, 2], "vgn": vgn}
+
+
+def evaluar_escenarios(modelo: dict, duraciones: np.ndarray):
+    """Inicio y fin (S, N) de cada escenario con el orden fijo del modelo."""
+    listo = np.repeat(modelo["inicio"][:, None], duraciones.shape[0], axis=1)
+    fin = np.empty_like(listo)
+    for frente, origen, destino in modelo["niveles"]:
+        fin[frente] = listo[frente] + duraciones.T[frente]
+        if len(destino):
+            np.maximum.at(listo, destino, fin[origen])
+    return (fin - duraciones.T).T, fin.T
+
+
+def _lote_riesgo(args):
+    semilla, n, horizonte, resolucion = args
+    m = _MODELO
+    rng = np.random.default_rng(semilla)
+    dur = rng.triangular(m["min"], m["moda"], np.maximum(m["max"], m["moda"] + 1e-9), size=(n, len(m["vgn"])))
+    ini, fin = evaluar_escenarios(m, dur)
+    _, av, _ = curva_s_lote(ini, fin, m["vgn"], dur, horizonte, resolucion)
+    return fin.max(axis=1, initial=0), np.minimum(av * 100, 100)
+
+
+def simular_riesgo(prog: pd.DataFrame, n_escenarios: int = 2000, riesgo_thr=4, semilla: int = 0,
+                   horizonte: float = None, resolucion: float = 1.0, n_procesos: int = None,
+                   distribucion: dict = None) -> dict:
+    """
+    Monte Carlo de duraciones sobre el programa `prog` con su orden fijo. Los
+    escenarios se evalúan en lotes de ESCENARIOS_POR_LOTE (matrices NumPy) y
+    los lotes se reparten en un pool de procesos; cada lote tiene su propia
+    semilla derivada, así que el resultado no depende del número de procesos.
+    Devuelve:
+      "resumen"   → P50/P80/P90 de makespan (h) y fecha de fin
+      "bandas"    → curva S con avance P10/P50/P90 por hora
+      "makespans" → makespan de cada escenario
+    """
+    modelo = modelo_riesgo(prog, riesgo_thr, distribucion)
+    # Con todas las duraciones ×k ningún fin pasa de k × fin programado
+    k = max((v[2] for v in (distribucion or DISTRIBUCION_DURACION).values())) * COLA_CRITICIDAD
+    horizonte = horizonte or float(np.ceil(max(modelo["fin_plan"], 1) * k))
+    tamanos = [ESCENARIOS_POR_LOTE] * (n_escenarios // ESCENARIOS_POR_LOTE)
+    if n_escenarios % ESCENARIOS_POR_LOTE:
+        tamanos.append(n_escenarios % ESCENARIOS_POR_LOTE)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    lotes = [(sem, n, horizonte, resolucion) for sem, n in zip(semillas, tamanos)]
+
+    n_procesos = min(n_procesos or os.cpu_count() or 1, len(lotes))
+    if n_procesos <= 1:
+        _iniciar_riesgo(modelo)
+        res = [_lote_riesgo(lote) for lote in lotes]
+    else:
+        with ProcessPoolExecutor(max_workers=n_procesos, mp_context=mp.get_context("spawn"),
+                                 initializer=_iniciar_riesgo, initargs=(modelo,)) as ex:
+            res = list(ex.map(_lote_riesgo, lotes))
+
+    mks = np.concatenate([r[0] for r in res])
+    av  = np.concatenate([r[1] for r in res])
+    t   = np.minimum(np.arange(av.shape[1]) * resolucion, horizonte)  # último paso = horizonte
+    pct = (50, 80, 90)
+    horas = np.percentile(mks, pct)
+    resumen = pd.DataFrame({
+        "percentil": [f"P{p}" for p in pct],
+        "makespan_h": horas.round(1),
+        "fin": [INICIO_SD + pd.Timedelta(hours=float(h)) for h in horas],
+    })
+    p10, p50, p90 = np.percentile(av, (10, 50, 90), axis=0)
+    bandas = pd.DataFrame({
+        "hora_sd": t.astype(int) if float(resolucion).is_integer() else t,
+        "hora_real": INICIO_SD + pd.to_timedelta(t, unit="h"),
+        "avance_p10": p10.round(2), "avance_p50": p50.round(2), "avance_p90": p90.round(2),
+    })
+    return {"resumen": resumen, "bandas": bandas, "makespans": mks}
+
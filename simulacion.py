@@ -0,0 +1,1561 @@
+"""
+=============================================================================
+SIMULACIÓN PARADA DE PLANTA SD18MAR26 - MOTOR DE CÁLCULO
+Carga, limpieza, scoring, programación, curva S, técnicos y exportación.
+Sin dependencias de Streamlit ni Plotly: lo usan app2.py y simular.py.
+=============================================================================
+"""
+
+import hashlib
+import heapq
+import io
+import os
+import tempfile
+import warnings
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+warnings.filterwarnings("ignore")
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CONSTANTES
+# ─────────────────────────────────────────────────────────────────────────────
+
+INICIO_SD = datetime(2026, 3, 18, 6, 0)
+
+CAPACIDAD_RECURSOS = {
+    "MECÁNICA": 8, "ELÉCTRICA": 6, "INSTRUMENTACIÓN": 5,
+    "TELECOMUNICACIONES": 3, "ENERGÉTICA": 2, "CIVIL": 4,
+    "OPERACIONES": 6, "INSPECCIÓN": 3, "CONTROLES": 2,
+    "SER": 2, "VLV": 2, "AMBIENTAL": 2, "DEFAULT": 4,
+}
+
+# Reparto de horas de una OT entre sus especialidades (conjunto → pesos).
+# Los conjuntos no listados se reparten en partes iguales (ver calcular_pesos).
+PESOS_ESPECIALIDAD = {
+    ("ELÉCTRICA", "MECÁNICA"):        {"MECÁNICA": 0.65, "ELÉCTRICA": 0.35},
+    ("INSTRUMENTACIÓN", "MECÁNICA"):  {"MECÁNICA": 0.70, "INSTRUMENTACIÓN": 0.30},
+    ("ELÉCTRICA", "INSTRUMENTACIÓN"): {"ELÉCTRICA": 0.60, "INSTRUMENTACIÓN": 0.40},
+    ("ELÉCTRICA", "INSTRUMENTACIÓN", "MECÁNICA"):
+        {"MECÁNICA": 0.5, "ELÉCTRICA": 0.3, "INSTRUMENTACIÓN": 0.2},
+}
+
+# Columnas que se leen de cada libro y su nombre interno
+COLUMNAS_PDT = {
+    "Centro planificación": "centro",
+    "Actividades":          "actividad",
+    "Orden":                "orden",
+    "Computación":          "computacion",
+    "TIEMPO (Hrs)":         "duracion_h",
+    "ESTADO":               "estado",
+    "ESPECIALIDAD":         "especialidad",
+    "EJECUTOR":             "ejecutor",
+    "CRITICIDAD":           "criticidad",
+    "ASEGURADOR":           "asegurador",
+    "Riesgo del Entorno":   "riesgo_texto",
+    "Criticidad":           "criticidad_num",
+    "Riesgo Entorno":       "riesgo_num",
+    "Avance % Act.":        "avance_pct",
+    "Valor Global %.":      "valor_global",
+    "% ACUM CENTRO":        "acum_centro",
+    "% ACUM TOTAL":         "acum_total",
+    "RUTA CRITICA":         "ruta_critica",
+    # Red de precedencias (opcional): IDs separados por ";" o ","; solo fin-comienzo
+    "ID":                   "id_pdt",
+    "Predecesoras":         "predecesoras",
+    "Sucesoras":            "sucesoras",
+}
+
+COLUMNAS_ACT = {
+    "Actividades": "actividad", "Centro planificación": "centro",
+    "CRITICIDAD": "criticidad_act", "HSE OCENSA": "hse",
+    "INTERFERENCIA": "interferencia", "COMENTARIOS": "comentarios",
+}
+
+# Texto repetido de pocos valores: se guarda como categórica (códigos + tabla de valores)
+COLUMNAS_CATEGORICAS = ("centro", "especialidad", "criticidad", "estado", "ruta_critica",
+                        "turno", "estado_replan")
+
+# Caché en disco de los Excel ya leídos (LRU acotado por tamaño). Las hojas con
+# tipos mezclados se guardan en pickle, que ejecuta código al leerse: se confía
+# en todo lo que haya en CACHE_DIR, así que debe ser un directorio privado del
+# usuario (se crea con permisos 0700), nunca uno compartido o escribible por otros.
+CACHE_DIR     = Path(os.environ.get("PARO_CACHE_DIR", Path.home() / ".cache" / "paro_planta"))
+CACHE_MAX_MB  = int(os.environ.get("PARO_CACHE_MAX_MB", "512"))
+CACHE_VERSION = 2  # subir si cambia la forma de leer las hojas
+
+# Textos que pandas.read_excel interpreta como vacío
+_NA_EXCEL = {"", "#N/A", "N/A", "n/a", "NA", "<NA>", "NULL", "null", "NaN", "nan", "-nan", "None"}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 1: CARGA Y LIMPIEZA
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _leer_hoja(b: bytes, hoja: str, columnas, requerida: str) -> pd.DataFrame:
+    """
+    Lectura en streaming (openpyxl read-only): solo se extraen las `columnas`
+    indicadas y se descartan al vuelo las filas con `requerida` vacía, sin
+    materializar el libro completo. La columna "fila_hoja" guarda la posición
+    original de cada fila de datos (1, 2, …), contando las descartadas.
+    """
+    wb = openpyxl.load_workbook(io.BytesIO(b), read_only=True, data_only=True)
+    try:
+        ws = wb[hoja]
+        ws.reset_dimensions()  # algunos exportadores declaran mal el rango usado
+        filas = ws.iter_rows(values_only=True)
+
+        pos = {}
+        for i, c in enumerate(next(filas, ())):
+            nombre = str(c).strip().replace("\n", " ") if c is not None else None
+            if nombre in columnas and nombre not in pos:
+                pos[nombre] = i
+        nombres = list(pos)
+        idx     = list(pos.values())
+        k_req   = nombres.index(requerida) if requerida in pos else None
+
+        datos = []
+        for n, fila in enumerate(filas, 1):
+            valores = [fila[i] if i < len(fila) else None for i in idx]
+            valores = [None if (isinstance(v, str) and v.strip() in _NA_EXCEL) else v
+                       for v in valores]
+            if k_req is not None and valores[k_req] is None:
+                continue
+            datos.append(valores + [n])
+    finally:
+        wb.close()
+
+    return pd.DataFrame(datos, columns=nombres + ["fila_hoja"]).infer_objects()
+
+
+def _leer_hoja_cache(b: bytes, hoja: str, columnas, requerida: str) -> pd.DataFrame:
+    """
+    Lee una hoja pasando por la caché en disco. La clave es el SHA-256 del
+    archivo + hoja + columnas, así que el mismo libro se reutiliza entre sesiones y
+    reinicios. Se guarda en Parquet; las hojas con columnas de tipos mezclados
+    (que Arrow no admite) se guardan en pickle.
+    """
+    h = hashlib.sha256(b)
+    h.update(f"|{hoja}|{'|'.join(columnas)}|{requerida}|v{CACHE_VERSION}".encode())
+    clave = h.hexdigest()
+
+    for ruta, leer in ((CACHE_DIR / f"{clave}.parquet", pd.read_parquet),
+                       (CACHE_DIR / f"{clave}.pkl",     pd.read_pickle)):
+        if ruta.exists():
+            try:
+                df = leer(ruta)
+            except Exception:
+                ruta.unlink(missing_ok=True)
+                continue
+            try:
+                os.utime(ruta)  # marca de uso para el LRU
+            except OSError:     # podada por otro proceso o caché de solo lectura
+                pass
+            return df
+
+    df = _leer_hoja(b, hoja, columnas, requerida)
+    _guardar_cache(clave, df)
+    return df
+
+
+def _guardar_cache(clave: str, df: pd.DataFrame):
+    try:
+        CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)  # solo el usuario
+    except OSError:
+        return
+    # Temporal con nombre único: dos procesos pueden guardar la misma clave a la vez
+    try:
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".tmp", delete=False) as fh:
+            tmp = Path(fh.name)
+    except OSError:
+        return
+    try:
+        try:
+            df.to_parquet(tmp, index=False)
+            ext = ".parquet"
+        except Exception:
+            df.to_pickle(tmp)
+            ext = ".pkl"
+        os.replace(tmp, CACHE_DIR / f"{clave}{ext}")  # escritura atómica
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return
+    _podar_cache()
+
+
+def _podar_cache():
+    """Elimina las entradas usadas hace más tiempo hasta quedar bajo CACHE_MAX_MB."""
+    entradas = []
+    for p in CACHE_DIR.iterdir():
+        if p.suffix in (".parquet", ".pkl"):
+            try:
+                info = p.stat()
+            except FileNotFoundError:  # otro proceso la podó entre iterdir() y stat()
+                continue
+            entradas.append((info.st_mtime, info.st_size, p))
+    total = sum(e[1] for e in entradas)
+    for _, tam, p in sorted(entradas):
+        if total <= CACHE_MAX_MB * 1024 * 1024:
+            break
+        p.unlink(missing_ok=True)
+        total -= tam
+
+
+def cargar_actividades(b: bytes) -> pd.DataFrame:
+    return _leer_hoja_cache(b, "Lista de Actividades SD", tuple(COLUMNAS_ACT), "Actividades")
+
+
+def cargar_pdt(b: bytes) -> pd.DataFrame:
+    return _leer_hoja_cache(b, "Actividades", tuple(COLUMNAS_PDT), "Actividades")
+
+
+def _id_por_fila(pdt: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sin columna ID, las precedencias se refieren a la posición de la fila en la
+    hoja (1, 2, …): se usa "fila_hoja", que cuenta también las filas vacías que
+    la lectura descartó, para que las referencias apunten a la actividad correcta.
+    """
+    fila = pdt.pop("fila_hoja") if "fila_hoja" in pdt else np.arange(1, len(pdt) + 1)
+    if "id_pdt" not in pdt:
+        pdt["id_pdt"] = fila
+    return pdt
+
+
+def limpiar_unificar(df_act: pd.DataFrame, df_pdt: pd.DataFrame) -> pd.DataFrame:
+    pdt = _id_por_fila(df_pdt.rename(columns=COLUMNAS_PDT))
+    for col in ("predecesoras", "sucesoras"):
+        if col not in pdt:
+            pdt[col] = None
+    pdt = pdt[pdt["actividad"].notna()].copy()
+    pdt = pdt[pd.to_numeric(pdt["duracion_h"], errors="coerce") > 0].copy()
+
+    act = df_act.rename(columns=COLUMNAS_ACT)
+    keep = ["actividad", "criticidad_act", "hse", "interferencia", "comentarios"]
+    act  = act[[c for c in keep if c in act.columns]].dropna(subset=["actividad"])
+    act  = act.drop_duplicates(subset=["actividad"])
+
+    df = pdt.merge(act, on="actividad", how="left")
+    df["duracion_h"]     = pd.to_numeric(df["duracion_h"], errors="coerce").fillna(1).clip(1, 50)
+    df["criticidad_num"] = pd.to_numeric(df["criticidad_num"], errors="coerce").fillna(2)
+    df["riesgo_num"]     = pd.to_numeric(df["riesgo_num"], errors="coerce").fillna(1)
+    df["valor_global"]   = pd.to_numeric(df["valor_global"], errors="coerce").fillna(0)
+    df["avance_pct"]     = pd.to_numeric(df["avance_pct"], errors="coerce").fillna(0)
+    df["criticidad"]     = df["criticidad"].fillna("Baja").str.strip()
+    df["ruta_critica"]   = df["ruta_critica"].fillna("NO").str.upper().str.strip()
+    df["centro"]         = df["centro"].fillna("GEN").str.strip().str.upper()
+    df["estado"]         = df["estado"].fillna("PROGRAMADO").str.strip().str.upper()
+    df["especialidad"]   = df["especialidad"].fillna("DEFAULT").str.strip().str.upper()
+    df["id_pdt"]         = pd.to_numeric(df["id_pdt"], errors="coerce").astype("Int64")
+
+    df["ejecutor"] = df["ejecutor"].fillna("").str.strip().str.upper()
+    df = df[df["ejecutor"].isin(["MASSY ENERGY", "MASSY ENERGY GEN"])]
+
+    # Diccionario de correcciones comunes
+    correcciones = {
+        "ELÉCTRCIA": "ELÉCTRICA",
+        "INSTRUMEMTACIÓN": "INSTRUMENTACIÓN",
+        "INSTRUMENTACION": "INSTRUMENTACIÓN",
+        "MECÁNICA/INSTRUMENTACIÓN": "MECÁNICA, INSTRUMENTACIÓN",
+        "MECÁNICA/INSTRUMEMTACIÓN": "MECÁNICA, INSTRUMENTACIÓN",
+    }
+
+    df["especialidad"] = df["especialidad"].replace(correcciones)
+    df["especialidad"] = df["especialidad"].str.replace(r"\s*,\s*", ", ", regex=True)
+    df = df.reset_index(drop=True)
+    df["id"] = df.index
+    return compactar(df)
+
+
+def compactar(df: pd.DataFrame) -> pd.DataFrame:
+    """Pasa a categóricas (in situ) las COLUMNAS_CATEGORICAS presentes en `df`."""
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 2: SCORING MULTICRITERIO
+# ─────────────────────────────────────────────────────────────────────────────
+
+def scoring(df: pd.DataFrame, w_crit, w_riesgo, w_valor, w_dur) -> pd.DataFrame:
+    def norm(s):
+        mn, mx = s.min(), s.max()
+        return pd.Series(np.ones(len(s)), index=s.index) if mx == mn else (s - mn) / (mx - mn)
+    df = df.copy()
+    df["score"] = (w_crit * norm(df["criticidad_num"])
+                 + w_riesgo * norm(df["riesgo_num"])
+                 + w_valor * norm(df["valor_global"])
+                 - w_dur * norm(df["duracion_h"]))
+    df.loc[df["ruta_critica"] == "SI", "score"] += 1.0
+    df["score"] += (df["criticidad"].map({"Muy Alta": 0.8, "Alta": 0.5, "Media": 0.2, "Baja": 0.0})
+                    .astype(float).fillna(0))
+    df["prioridad"] = df["score"].rank(ascending=False, method="first").astype(int)
+    return df.sort_values("score", ascending=False).reset_index(drop=True)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 3A: CALENDARIO DE TURNOS
+# ─────────────────────────────────────────────────────────────────────────────
+
+class CalendarioTurnos:
+    """
+    Turnos de la parada precalculados como arreglos indexados por hora SD:
+      turno[h]         → nº de turno (0, 1, …) que cubre la hora h
+      disponible[k, h] → la cuadrilla k trabaja en la hora h
+      laborable[h]     → alguna cuadrilla trabaja en la hora h
+    Los turnos duran `duracion_turno` horas desde INICIO_SD. Cada cuadrilla
+    descansa al menos `descanso_h` entre turnos, así que trabaja uno de cada
+    `ciclo` turnos; con `cuadrillas` < ciclo quedan turnos sin cubrir (no
+    laborables). `bloqueos` = {k: [(inicio, fin), …]} quita horas a la
+    cuadrilla k. Los técnicos se asignan a `cuadrillas_tecnicos` por rotación.
+    Por defecto: 3 turnos de 8 h en 36 h; cada técnico trabaja SD0-8 y SD24-32.
+    """
+
+    def __init__(self, horizonte: int = 36, duracion_turno: int = 8, descanso_h: int = 16,
+                 cuadrillas: int = None, bloqueos: dict = None, cuadrillas_tecnicos=(0,),
+                 inicio: datetime = INICIO_SD):
+        if horizonte < 1 or duracion_turno < 1 or descanso_h < 0:
+            raise ValueError("Calendario: horizonte y duración de turno deben ser ≥ 1 y el descanso ≥ 0")
+        self.horizonte      = int(horizonte)
+        self.duracion_turno = int(duracion_turno)
+        self.descanso_h     = int(descanso_h)
+        self.inicio         = inicio
+        self.ciclo          = -(-(self.duracion_turno + self.descanso_h) // self.duracion_turno)
+        self.n_cuadrillas   = self.ciclo if cuadrillas is None else int(cuadrillas)
+        self.bloqueos       = {int(k): [(int(a), int(b)) for a, b in v] for k, v in (bloqueos or {}).items()}
+        self.cuadrillas_tecnicos = tuple(int(k) for k in cuadrillas_tecnicos)
+        if not self.cuadrillas_tecnicos or not all(0 <= k < self.n_cuadrillas
+                                                   for k in (*self.cuadrillas_tecnicos, *self.bloqueos)):
+            raise ValueError(f"Calendario: las cuadrillas van de 0 a {self.n_cuadrillas - 1}")
+
+        self._extender(self.horizonte)
+        self.disponible = (self.turno[None, :self.horizonte] % self.ciclo
+                           == np.arange(self.n_cuadrillas)[:, None])
+        for k, tramos in self.bloqueos.items():
+            for a, b in tramos:
+                self.disponible[k, max(a, 0):b] = False
+        self.laborable = self.disponible.any(axis=0)
+
+    def __repr__(self):
+        # También es la huella del calendario en CacheEtapas
+        return (f"CalendarioTurnos(horizonte={self.horizonte}, duracion_turno={self.duracion_turno}, "
+                f"descanso_h={self.descanso_h}, cuadrillas={self.n_cuadrillas}, "
+                f"bloqueos={self.bloqueos}, cuadrillas_tecnicos={self.cuadrillas_tecnicos}, "
+                f"inicio={self.inicio:%Y-%m-%d %H:%M})")
+
+    def _extender(self, n_horas: int):
+        """Amplía turno[] y las etiquetas hasta cubrir n_horas (programas más allá del horizonte)."""
+        if n_horas <= len(getattr(self, "turno", ())):
+            return
+        n_horas = max(n_horas, 2 * len(getattr(self, "turno", ())))
+        self.turno = (np.arange(n_horas) // self.duracion_turno).astype(np.int32)
+        h0 = (self.inicio.hour + np.arange(self.turno[-1] + 1) * self.duracion_turno) % 24
+        h1 = (h0 + self.duracion_turno) % 24
+        self.etiquetas = np.array([f"T{t + 1} ({a:02d}-{b:02d}h)" for t, (a, b) in enumerate(zip(h0, h1))],
+                                  dtype=object)
+
+    def etiqueta_turno(self, horas: np.ndarray) -> np.ndarray:
+        """Etiqueta "Tn (hh-hhh)" del turno de cada hora SD."""
+        horas = np.asarray(horas, dtype=np.int64)
+        self._extender(int(horas.max(initial=0)) + 1)
+        return self.etiquetas[self.turno[horas]]
+
+    def tramos_cerrados(self):
+        """Tramos [inicio, fin) del horizonte sin ninguna cuadrilla."""
+        return _tramos(~self.laborable)
+
+    def ventanas(self, k: int):
+        """Tramos [inicio, fin) de trabajo de la cuadrilla k dentro del horizonte."""
+        return _tramos(self.disponible[k])
+
+    def horas_tecnico(self) -> int:
+        """Horas que aporta un técnico en el horizonte (la cuadrilla de técnicos con menos horas)."""
+        return int(self.disponible[list(self.cuadrillas_tecnicos)].sum(axis=1).min())
+
+
+def _tramos(mascara: np.ndarray):
+    """Tramos [inicio, fin) donde la máscara booleana es verdadera."""
+    borde = np.diff(np.concatenate(([0], mascara.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(borde == 1).tolist(), np.flatnonzero(borde == -1).tolist()))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 3P: RED DE PRECEDENCIAS Y CPM
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _referencias(col: pd.Series) -> pd.Series:
+    """Referencias "12; 15FC+2" → 12, 15: una fila por referencia, índice = posición de la actividad."""
+    partes = col.dropna().astype(str).str.split(r"[;,]").explode()
+    return pd.to_numeric(partes.str.extract(r"^\s*(\d+)", expand=False), errors="coerce").dropna()
+
+
+def red_precedencias(df: pd.DataFrame):
+    """
+    Adyacencia CSR de sucesoras sobre las posiciones de `df`: las sucesoras de i
+    son indices[indptr[i]:indptr[i+1]]. Une las columnas predecesoras y sucesoras;
+    las referencias a actividades que no están en `df` (otro ejecutor, sin
+    duración) se descartan.
+    """
+    n = len(df)
+    pred = np.empty(0, dtype=np.int64)
+    succ = np.empty(0, dtype=np.int64)
+    if "id_pdt" in df and n:
+        ids = df["id_pdt"].to_numpy(dtype=float, na_value=np.nan)
+        pos_de_id = pd.Series(np.arange(n), index=ids)
+        pos_de_id = pos_de_id[~pos_de_id.index.duplicated() & pos_de_id.index.notna()]
+        for col, invertir in (("predecesoras", False), ("sucesoras", True)):
+            if col not in df:
+                continue
+            refs = _referencias(df[col].reset_index(drop=True))
+            otro = pos_de_id.reindex(refs.to_numpy()).to_numpy()
+            ok   = ~np.isnan(otro)
+            a, b = otro[ok].astype(np.int64), refs.index.to_numpy()[ok].astype(np.int64)
+            if invertir:
+                a, b = b, a
+            pred, succ = np.concatenate((pred, a)), np.concatenate((succ, b))
+
+    arcos = np.unique(pred[pred != succ] * max(n, 1) + succ[pred != succ])
+    pred, succ = arcos // max(n, 1), arcos % max(n, 1)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(pred, minlength=n)))).astype(np.int64)
+    return indptr, succ.astype(np.int64)
+
+
+def _vecinos(indptr: np.ndarray, indices: np.ndarray, nodos: np.ndarray):
+    """Arcos (origen, destino) que salen de `nodos`, sin bucle en Python."""
+    cuenta = indptr[nodos + 1] - indptr[nodos]
+    origen = np.repeat(nodos, cuenta)
+    salto  = np.repeat(indptr[nodos] - (np.cumsum(cuenta) - cuenta), cuenta)
+    return origen, indices[np.arange(int(cuenta.sum())) + salto]
+
+
+def _id_legible(v):
+    """ID del PDT como se escribe en la hoja (3.0 → 3)."""
+    return int(v) if isinstance(v, (int, float, np.integer, np.floating)) and float(v).is_integer() else v
+
+
+def calcular_cpm(dur: np.ndarray, indptr: np.ndarray, indices: np.ndarray, ids=None):
+    """
+    Pasadas hacia adelante y hacia atrás del CPM por niveles topológicos (Kahn):
+    O(V+E) con operaciones NumPy por nivel. Devuelve inicio temprano e inicio
+    tardío; holgura = tardío - temprano. ValueError si la red tiene ciclos; con
+    `ids` (ID del PDT por posición) el mensaje nombra las actividades por ID.
+    """
+    n   = len(dur)
+    dur = np.asarray(dur, dtype=np.int64)
+    pendientes = np.bincount(indices, minlength=n)
+    temprano   = np.zeros(n, dtype=np.int64)
+    niveles    = []
+    frente     = np.flatnonzero(pendientes == 0)
+    while len(frente):
+        niveles.append(frente)
+        origen, destino = _vecinos(indptr, indices, frente)
+        np.maximum.at(temprano, destino, temprano[origen] + dur[origen])
+        np.subtract.at(pendientes, destino, 1)
+        destino = np.unique(destino)
+        frente  = destino[pendientes[destino] == 0]
+
+    if sum(map(len, niveles)) < n:
+        en_ciclo = np.flatnonzero(pendientes > 0)
+        if ids is None:
+            detalle = f"posiciones {en_ciclo[:10].tolist()}"
+        else:
+            detalle = f"ID {[_id_legible(v) for v in np.asarray(ids, dtype=object)[en_ciclo[:10]]]}"
+        raise ValueError(f"Precedencias con ciclo: {len(en_ciclo)} actividades no se pueden "
+                         f"ordenar ({detalle}{'…' if len(en_ciclo) > 10 else ''})")
+
+    fin_red = int((temprano + dur).max(initial=0))
+    fin_tardio = np.full(n, fin_red, dtype=np.int64)
+    for frente in reversed(niveles):
+        origen, destino = _vecinos(indptr, indices, frente)
+        np.minimum.at(fin_tardio, origen, fin_tardio[destino] - dur[destino])
+    return temprano, fin_tardio - dur
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 3: PROGRAMACIÓN GREEDY + RESOURCE LEVELING
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _capacidad(esp_k: str) -> int:
+    return next((v for k, v in CAPACIDAD_RECURSOS.items() if k in esp_k.upper()), 4)
+
+
+def _sumas_ventana(x: np.ndarray, dur: int) -> np.ndarray:
+    """Suma de x[t:t+dur] para cada inicio t posible, vía suma acumulada."""
+    acum = np.concatenate(([0], np.cumsum(x, dtype=np.int64)))
+    return acum[dur:] - acum[:-dur]
+
+
+class OcupacionRecursos:
+    """
+    Ocupación hora a hora de la parada en arreglos NumPy:
+      uso[e, h] → actividades simultáneas de la especialidad e en la hora h
+      cr[c, h]  → hora h tomada en el centro c por una actividad de alta criticidad
+      cerrado[h] → hora h sin cuadrilla en el calendario (None si no hay)
+    Las ventanas factibles salen de sumas deslizantes, sin recorrer hora a hora.
+    """
+
+    def __init__(self, capacidades, n_centros: int, n_horas: int, laborable: np.ndarray = None):
+        self.cap = np.asarray(capacidades, dtype=np.int64)
+        self.uso = np.zeros((len(self.cap), n_horas), dtype=np.int64)
+        self.cr  = np.zeros((n_centros, n_horas), dtype=bool)
+        self.cerrado = None
+        if laborable is not None and not laborable.all():
+            self.cerrado = np.zeros(n_horas, dtype=bool)
+            self.cerrado[:len(laborable)] = ~laborable[:n_horas]
+
+    def primera_ventana(self, e: int, c: int, dur: int, alto: bool, horizonte: int, desde: int = 0):
+        """Primer inicio ≥ desde sin saturar la especialidad ni el centro; None si no hay."""
+        if desde + dur > horizonte:
+            return None
+        lleno = self.uso[e, desde:horizonte] >= self.cap[e]
+        if alto:
+            lleno |= self.cr[c, desde:horizonte]
+        if self.cerrado is not None:
+            lleno |= self.cerrado[desde:horizonte]
+        libres = np.flatnonzero(_sumas_ventana(lleno, dur) == 0)
+        return desde + int(libres[0]) if len(libres) else None
+
+    def primer_hueco(self, e: int, c: int, dur: int, alto: bool, desde: int = 0) -> int:
+        """Primer inicio ≥ desde sin saturar nada, sin tope: amplía los arreglos si no cabe."""
+        while True:
+            t = self.primera_ventana(e, c, dur, alto, self.uso.shape[1], desde)
+            if t is not None:
+                return t
+            self._ampliar(max(2 * self.uso.shape[1], desde + dur))
+
+    def _ampliar(self, n_horas: int):
+        extra = n_horas - self.uso.shape[1]
+        self.uso = np.pad(self.uso, ((0, 0), (0, extra)))
+        self.cr  = np.pad(self.cr, ((0, 0), (0, extra)))
+        if self.cerrado is not None:
+            self.cerrado = np.pad(self.cerrado, (0, extra))  # más allá del calendario no hay cierres
+
+    def ventana_menor_carga(self, e: int, c: int, dur: int, alto: bool, horizonte: int,
+                            desde: int = 0) -> int:
+        """
+        Inicio ≥ desde con menor saturación acumulada dentro del horizonte (primera
+        en caso de empate). Si la actividad ya no cabe antes del horizonte no se
+        nivela: va al primer hueco libre después de `desde`.
+        """
+        if desde + dur > horizonte:
+            return self.primer_hueco(e, c, dur, alto, desde)
+        # carga · cap = Σ uso + cap · horas en conflicto → comparación entera exacta
+        carga = _sumas_ventana(self.uso[e, desde:horizonte], dur)
+        if alto:
+            carga = carga + self.cap[e] * _sumas_ventana(self.cr[c, desde:horizonte], dur)
+        if self.cerrado is not None:
+            # una hora sin cuadrilla pesa más que cualquier saturación posible
+            tope  = (int(self.uso[e, :horizonte].max(initial=0)) + int(self.cap[e])) * dur + 1
+            carga = carga + tope * _sumas_ventana(self.cerrado[desde:horizonte], dur)
+        return desde + int(np.argmin(carga))
+
+    def reservar(self, e: int, c: int, inicio: int, fin: int, alto: bool):
+        self.uso[e, inicio:fin] += 1
+        if alto:
+            self.cr[c, inicio:fin] = True
+
+    def reservar_lote(self, e: np.ndarray, c: np.ndarray, inicio: np.ndarray, fin: np.ndarray,
+                      alto: np.ndarray):
+        """Reserva muchas actividades de una vez con arreglos de diferencias (+1 inicio, -1 fin)."""
+        n_horas = self.uso.shape[1]
+        delta = np.zeros((len(self.cap), n_horas + 1), dtype=np.int64)
+        np.add.at(delta, (e, inicio), 1)
+        np.add.at(delta, (e, fin), -1)
+        self.uso += np.cumsum(delta, axis=1)[:, :n_horas]
+        delta = np.zeros((self.cr.shape[0], n_horas + 1), dtype=np.int64)
+        np.add.at(delta, (c[alto], inicio[alto]), 1)
+        np.add.at(delta, (c[alto], fin[alto]), -1)
+        self.cr |= np.cumsum(delta, axis=1)[:, :n_horas] > 0
+
+
+def _ids(df: pd.DataFrame):
+    """ID del PDT por posición (None sin columna id_pdt) para los mensajes de calcular_cpm."""
+    return df["id_pdt"].to_numpy(dtype=object) if "id_pdt" in df else None
+
+
+def _preparar_programa(df: pd.DataFrame, riesgo_thr):
+    """Orden por score, arreglos codificados y red CSR que consumen ambos motores."""
+    df = df.sort_values("score", ascending=False).reset_index(drop=True)
+    red = red_precedencias(df)
+
+    dur        = np.maximum(1, df["duracion_h"].astype(int).to_numpy())
+    esp_cod, esp_keys = pd.factorize(df["especialidad"].astype(str).str[:25])
+    cen_cod, centros  = pd.factorize(df["centro"])
+    alto       = (df["criticidad_num"] >= riesgo_thr).to_numpy()
+    cap        = np.array([_capacidad(k) for k in esp_keys], dtype=np.int64)
+    return df, dur, esp_cod, cap, cen_cod, len(centros), alto, red
+
+
+def programar(df: pd.DataFrame, horizonte: int = None, riesgo_thr=4,
+              calendario: CalendarioTurnos = None) -> pd.DataFrame:
+    """
+    Greedy por score dentro de `horizonte` horas (por defecto el del calendario),
+    sin usar horas que el calendario deja sin cuadrilla. Con red de precedencias
+    es una lista topológica: en cada paso se programa la actividad de mayor
+    score cuyas predecesoras ya terminaron, desde el fin de la última de ellas.
+    """
+    calendario = calendario or CalendarioTurnos()
+    HORIZONTE  = int(horizonte or calendario.horizonte)
+
+    df, dur, esp_cod, cap, cen_cod, n_centros, alto, red = _preparar_programa(df, riesgo_thr)
+    calcular_cpm(dur, *red, _ids(df))  # valida que la red no tenga ciclos
+
+    n_horas = max(HORIZONTE, int(dur.max(initial=0)))
+    if len(red[1]):
+        n_horas += int(dur.sum())  # cadenas empujadas más allá del horizonte
+    ocup   = OcupacionRecursos(cap, n_centros, n_horas, calendario.laborable)
+    inicio = np.zeros(len(df), dtype=int)
+    _programar_lista(ocup, esp_cod, cen_cod, dur, alto, red, HORIZONTE,
+                     inicio, np.zeros(len(df), dtype=int), np.zeros(len(df), dtype=bool))
+
+    return _armar_cronograma(df, inicio, dur, calendario, HORIZONTE, red)
+
+
+def _programar_lista(ocup: OcupacionRecursos, esp_cod, cen_cod, dur, alto, red, HORIZONTE: int,
+                     inicio: np.ndarray, desde: np.ndarray, fijas: np.ndarray, ahora: int = 0):
+    """
+    Lista topológica sobre `ocup`: completa `inicio` de las actividades no `fijas`.
+    `desde` es el fin de la última predecesora y `ahora` la primera hora
+    programable; las fijas ya están reservadas y solo liberan a sus sucesoras.
+    """
+    indptr, sucesoras = red
+    pendientes = np.bincount(sucesoras, minlength=len(dur))
+
+    for i in np.flatnonzero(fijas):
+        for j in sucesoras[indptr[i]:indptr[i + 1]]:
+            desde[j] = max(desde[j], inicio[i] + dur[i])
+            pendientes[j] -= 1
+
+    # Cola de actividades liberadas por posición (= orden de score)
+    listas = np.flatnonzero((pendientes == 0) & ~fijas).tolist()
+    heapq.heapify(listas)
+
+    while listas:
+        i = heapq.heappop(listas)
+        e, c, d, a, t0 = esp_cod[i], cen_cod[i], dur[i], alto[i], max(desde[i], ahora)
+
+        # Intentar ubicar la actividad dentro del horizonte
+        t = ocup.primera_ventana(e, c, d, a, HORIZONTE, t0)
+
+        # Las predecesoras o `ahora` la empujan fuera del horizonte: primer hueco libre después
+        if t is None and t0 + d > HORIZONTE:
+            t = ocup.primer_hueco(e, c, d, a, t0)
+
+        # Si no se encontró ventana, ubicar en la de menor saturación dentro del horizonte
+        if t is None:
+            t = ocup.ventana_menor_carga(e, c, d, a, HORIZONTE, t0)
+
+        ocup.reservar(e, c, t, t + d, a)
+        inicio[i] = t
+
+        for j in sucesoras[indptr[i]:indptr[i + 1]]:
+            desde[j] = max(desde[j], t + d)
+            pendientes[j] -= 1
+            if pendientes[j] == 0 and not fijas[j]:
+                heapq.heappush(listas, int(j))
+
+
+def _armar_cronograma(df: pd.DataFrame, inicio: np.ndarray, dur: np.ndarray,
+                      calendario: CalendarioTurnos, horizonte: int, red) -> pd.DataFrame:
+    """
+    Adjunta inicio/fin, turno, avance acumulado y ruta crítica al DataFrame ordenado.
+    Con red de precedencias la ruta crítica es la del CPM (holgura 0); sin ella se
+    estima con RUTA CRITICA, el cierre del programa y criticidad/duración altas.
+    """
+    fin     = inicio + dur
+    temprano, tardio = calcular_cpm(dur, *red, _ids(df))
+
+    df_r = df.copy()
+    df_r["start_sd"]         = inicio
+    df_r["end_sd"]           = fin
+    df_r["inicio_real"]      = INICIO_SD + pd.to_timedelta(inicio, unit="h")
+    df_r["fin_real"]         = INICIO_SD + pd.to_timedelta(fin, unit="h")
+    df_r["turno"]            = pd.Categorical(calendario.etiqueta_turno(inicio))
+    df_r["dentro_horizonte"] = fin <= horizonte
+    df_r["inicio_temprano"]  = temprano
+    df_r["inicio_tardio"]    = tardio
+    df_r["holgura_h"]        = tardio - temprano
+
+    total = df_r["valor_global"].sum()
+    df_r["valor_global_norm"] = (df_r["valor_global"] / total) if total > 0 else 1 / len(df_r)
+    df_r = df_r.sort_values("end_sd")
+    df_r["acum_total_calc"]  = (df_r["valor_global_norm"].cumsum() * 100).round(2)
+    df_r["acum_centro_calc"] = (
+        df_r.groupby("centro", observed=True)["valor_global_norm"].cumsum()
+        .div(df_r.groupby("centro", observed=True)["valor_global_norm"].transform("sum"))
+        .mul(100).round(2)
+    )
+    if len(red[1]):
+        df_r["es_critica"] = df_r["holgura_h"] == 0
+        return df_r
+    mksp   = df_r["end_sd"].max()
+    crit1  = df_r["ruta_critica"] == "SI"
+    crit2  = df_r["end_sd"] >= (mksp - 2)
+    crit3  = (df_r["criticidad_num"] >= 4) & (df_r["duracion_h"] >= 20)
+    df_r["es_critica"] = crit1 | crit2 | crit3
+    return df_r
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 3B: PROGRAMACIÓN EXACTA CP-SAT
+# ─────────────────────────────────────────────────────────────────────────────
+
+def programar_cpsat(df: pd.DataFrame, riesgo_thr=4, tiempo_limite: float = 30.0,
+                    n_workers: int = 8, calendario: CalendarioTurnos = None) -> pd.DataFrame:
+    """
+    Programa con CP-SAT (OR-Tools): intervalos por actividad, cumulativo por
+    especialidad según CAPACIDAD_RECURSOS y no-solapamiento por centro para las
+    actividades con criticidad >= riesgo_thr. Minimiza
+        Σ pesos · makespan + Σ peso_i · inicio_i
+    donde peso_i crece con el score; una hora de makespan cuesta lo mismo que
+    retrasar todas las actividades una hora. Las horas sin cuadrilla del
+    calendario ocupan toda la capacidad y las precedencias son fin-comienzo. La solución greedy se usa como pista
+    y como respaldo si el solver no encuentra solución en el tiempo límite.
+    """
+    from ortools.sat.python import cp_model
+
+    calendario = calendario or CalendarioTurnos()
+    greedy = programar(df, None, riesgo_thr, calendario)
+    df, dur, esp_cod, cap, cen_cod, n_centros, alto, red = _preparar_programa(df, riesgo_thr)
+    pista = greedy.set_index("id")["start_sd"].reindex(df["id"]).to_numpy()
+
+    sc    = df["score"].to_numpy(dtype=float)
+    rango = sc.max() - sc.min() if len(sc) else 0
+    pesos = 1 + (np.round(9 * (sc - sc.min()) / rango).astype(int) if rango > 0 else 0 * dur)
+
+    # Cota del horizonte del modelo: todo en serie, y con cierres en serie desde el
+    # fin del calendario (después ya no hay horas cerradas)
+    tramos = calendario.tramos_cerrados()
+    H = int(dur.sum()) + (calendario.horizonte if len(tramos) else 0)
+    model  = cp_model.CpModel()
+    inicio = [model.NewIntVar(0, H - int(d), f"ini_{i}") for i, d in enumerate(dur)]
+    ivs    = [model.NewFixedSizeIntervalVar(inicio[i], int(d), f"iv_{i}") for i, d in enumerate(dur)]
+    # un cierre que cruza H se recorta a [a, H): sigue bloqueando lo que cae antes
+    cerrados = [model.NewFixedSizeIntervalVar(a, min(b, H) - a, f"cerrado_{a}")
+                for a, b in tramos if a < H]
+
+    for e, c_e in enumerate(cap):
+        idx = np.flatnonzero(esp_cod == e)
+        model.AddCumulative([ivs[i] for i in idx] + cerrados,
+                            [1] * len(idx) + [int(c_e)] * len(cerrados), int(c_e))
+
+    for c in range(n_centros):
+        idx = np.flatnonzero((cen_cod == c) & alto)
+        if len(idx) > 1:
+            model.AddNoOverlap([ivs[i] for i in idx])
+
+    origen, destino = _vecinos(red[0], red[1], np.arange(len(dur)))
+    for i, j in zip(origen.tolist(), destino.tolist()):
+        model.Add(inicio[j] >= inicio[i] + int(dur[i]))
+
+    mksp = model.NewIntVar(0, H, "makespan")
+    model.AddMaxEquality(mksp, [inicio[i] + int(d) for i, d in enumerate(dur)])
+    model.Minimize(int(pesos.sum()) * mksp
+                   + cp_model.LinearExpr.WeightedSum(inicio, [int(p) for p in pesos]))
+
+    for v, t in zip(inicio, pista):
+        model.AddHint(v, int(t))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(tiempo_limite)
+    solver.parameters.num_search_workers  = int(n_workers)
+    solver.parameters.repair_hint         = True
+    estado = solver.Solve(model)
+
+    if estado not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        greedy.attrs["motor"] = f"Greedy (CP-SAT sin solución: {solver.StatusName(estado)})"
+        return greedy
+
+    df_r = _armar_cronograma(df, np.array([solver.Value(v) for v in inicio]), dur,
+                             calendario, calendario.horizonte, red)
+    df_r.attrs["motor"] = f"CP-SAT {solver.StatusName(estado)} · {solver.WallTime():.1f}s"
+    return df_r
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 3R: RE-PLAN DESDE AHORA
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Escala de "Avance % Act." en el PDT: 0-100 (exportación de Project) o fracción
+# 0-1 (celda con formato %). Se indica, no se deduce de los datos: con un 1 %
+# como máximo no se distingue de una fracción.
+ESCALAS_AVANCE = {"porcentaje": 100.0, "fraccion": 1.0}
+
+
+def _fraccion_avance(avance: pd.Series, escala: str = "porcentaje") -> pd.Series:
+    """Avance en 0-1 a partir de la columna del PDT en la `escala` indicada."""
+    if escala not in ESCALAS_AVANCE:
+        raise ValueError(f"Escala de avance desconocida: {escala!r} (use {', '.join(ESCALAS_AVANCE)})")
+    avance = pd.to_numeric(avance, errors="coerce").fillna(0)
+    return (avance / ESCALAS_AVANCE[escala]).clip(0, 1)
+
+
+def replanificar(prog: pd.DataFrame, ahora: int, avance: pd.Series = None, riesgo_thr=4,
+                 calendario: CalendarioTurnos = None, escala_avance: str = "porcentaje") -> pd.DataFrame:
+    """
+    Repara el cronograma vigente `prog` a la hora SD `ahora` sin reconstruirlo:
+      - terminadas (avance 100 %): quedan donde estaban, cerradas a más tardar en `ahora`
+      - en curso (0 < avance < 100 %): conservan su inicio y terminan en
+        ahora + horas restantes
+      - sin avance: se re-programan desde `ahora` con la misma lista topológica
+    La ocupación de las fijas se reserva de una vez (arreglos de diferencias) y
+    solo el resto pasa por el greedy. `avance` (alineado con prog.index) reemplaza
+    prog["avance_pct"]; `escala_avance` es una clave de ESCALAS_AVANCE. Las
+    horas restantes se redondean hacia arriba. attrs["ahora"] guarda la hora del re-plan.
+    """
+    calendario = calendario or CalendarioTurnos()
+    HORIZONTE  = calendario.horizonte
+    ahora      = int(ahora)
+
+    if avance is not None:
+        prog = prog.assign(avance_pct=avance.reindex(prog.index).fillna(prog["avance_pct"]))
+    df, dur, esp_cod, cap, cen_cod, n_centros, alto, red = _preparar_programa(prog, riesgo_thr)
+    calcular_cpm(dur, *red, _ids(df))
+
+    frac  = _fraccion_avance(df["avance_pct"], escala_avance).to_numpy()
+    ini0  = df["start_sd"].to_numpy(dtype=np.int64)
+    fin0  = df["end_sd"].to_numpy(dtype=np.int64)
+    hecha = frac >= 1
+    curso = (frac > 0) & ~hecha
+
+    inicio = np.zeros(len(df), dtype=np.int64)
+    fin    = np.zeros(len(df), dtype=np.int64)
+    fin[hecha]    = np.minimum(fin0[hecha], ahora)
+    inicio[hecha] = np.minimum(ini0[hecha], fin[hecha])
+    inicio[curso] = np.minimum(ini0[curso], ahora)
+    fin[curso]    = ahora + np.ceil(dur[curso] * (1 - frac[curso])).astype(np.int64)
+    fijas = hecha | curso
+
+    # Las fijas ocupan lo que realmente ocupan; el resto conserva su duración
+    dur = np.where(fijas, fin - inicio, dur)
+    n_horas = max(HORIZONTE, ahora, int(fin.max(initial=0))) + int(dur[~fijas].sum()) + 1
+    ocup = OcupacionRecursos(cap, n_centros, n_horas, calendario.laborable)
+    ocup.reservar_lote(esp_cod[fijas], cen_cod[fijas], inicio[fijas], fin[fijas], alto[fijas])
+
+    _programar_lista(ocup, esp_cod, cen_cod, dur, alto, red, HORIZONTE,
+                     inicio, np.zeros(len(df), dtype=np.int64), fijas, ahora)
+
+    df_r = _armar_cronograma(df, inicio, dur, calendario, HORIZONTE, red)
+    estado = np.select([hecha, curso], ["TERMINADA", "EN CURSO"], "REPROGRAMADA")
+    df_r["estado_replan"] = pd.Categorical(estado[df_r.index])
+    df_r.attrs["motor"] = f"Re-plan desde SD{ahora} · {int(hecha.sum())} terminadas, {int(curso.sum())} en curso"
+    df_r.attrs["ahora"] = ahora
+    return df_r
+
+
+def _items_pesos(tabla: dict = None) -> tuple:
+    """Contenido canónico de la tabla de pesos: huella de la etapa "reparto"."""
+    tabla = PESOS_ESPECIALIDAD if tabla is None else tabla
+    return tuple(sorted((tuple(sorted(conj)), tuple(p.items())) for conj, p in tabla.items()))
+
+
+def compilar_pesos(tabla: dict = None) -> dict:
+    """
+    Tabla conjunto → pesos como dict con clave frozenset, para que cada consulta
+    de calcular_pesos() sea O(1). Se compila una vez por corrida; sin `tabla`,
+    la de PESOS_ESPECIALIDAD ya compilada.
+    """
+    if tabla is None:
+        return _PESOS_COMPILADOS
+    return {frozenset(conj): dict(pesos) for conj, pesos in tabla.items()}
+
+
+def calcular_pesos(especialidades, compilada: dict = None) -> dict:
+    """
+    Pesos del conjunto según la tabla `compilada` (compilar_pesos(); por defecto
+    PESOS_ESPECIALIDAD); si el conjunto no está en ella, reparto parejo entre
+    las especialidades listadas en la OT.
+    """
+    conjunto = frozenset(especialidades)
+    if not conjunto:
+        return {"DEFAULT": 1.0}
+    pesos = (_PESOS_COMPILADOS if compilada is None else compilada).get(conjunto)
+    if pesos is not None:
+        return dict(pesos)
+    return {e: 1 / len(conjunto) for e in sorted(conjunto)}
+
+
+_PESOS_COMPILADOS = {frozenset(conj): dict(pesos) for conj, pesos in PESOS_ESPECIALIDAD.items()}
+
+
+def leer_tabla_pesos(origen, nombre: str = None) -> dict:
+    """
+    Lee la tabla de pesos de un CSV o Excel (ruta o buffer; `nombre` indica la
+    extensión de un buffer) con columnas: conjunto, especialidad, peso. El
+    conjunto son las especialidades separadas por coma y sus pesos deben sumar 1.
+    """
+    nombre = str(nombre or origen).lower()
+    df = pd.read_excel(origen) if nombre.endswith((".xlsx", ".xls")) else pd.read_csv(origen)
+    df.columns = df.columns.str.strip().str.lower()
+    faltan = {"conjunto", "especialidad", "peso"} - set(df.columns)
+    if faltan:
+        raise ValueError(f"Tabla de pesos sin columnas: {', '.join(sorted(faltan))}")
+
+    df = df.dropna(subset=["conjunto", "especialidad"])
+    df["especialidad"] = df["especialidad"].astype(str).str.strip().str.upper()
+    df["peso"] = pd.to_numeric(df["peso"], errors="raise")
+
+    tabla = {}
+    for texto, grp in df.groupby("conjunto", sort=False):
+        conj = tuple(sorted({e.strip().upper() for e in str(texto).split(",") if e.strip()}))
+        if not set(grp["especialidad"]) <= set(conj):
+            raise ValueError(f"Tabla de pesos: especialidades fuera del conjunto '{texto}'")
+        if abs(grp["peso"].sum() - 1) > 1e-6:
+            raise ValueError(f"Tabla de pesos: los pesos de '{texto}' suman {grp['peso'].sum():g}, no 1")
+        tabla[conj] = dict(zip(grp["especialidad"], grp["peso"].astype(float)))
+    return tabla
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 3C: TECNICOS POR ORDEN DE TRABAJO
+# ─────────────────────────────────────────────────────────────────────────────
+def _redondear_hora(valor: np.ndarray) -> np.ndarray:
+    """Redondeo a la hora: fracción >= 0.5 sube (valores no negativos)."""
+    entero = np.floor(valor)
+    return (entero + (valor - entero >= 0.5)).astype(int)
+
+
+def _repartir_especialidades(especialidad: pd.Series, compilada: dict = None):
+    """
+    Expande cada OT en sus especialidades: devuelve (pos, especialidad, peso),
+    una entrada por par OT-especialidad en el orden de calcular_pesos().
+
+    Los textos distintos se tokenizan con operaciones de texto de pandas; los
+    pesos salen de una tabla calculada una vez por conjunto de especialidades,
+    y la expansión a filas es un np.repeat sobre los códigos de texto.
+    """
+    texto = (especialidad.astype(str)
+             .str.replace("/", ",", regex=False)
+             .str.replace("INSTRUMENTACION", "INSTRUMENTACIÓN", regex=False)
+             .str.upper())
+    cod, unicos = pd.factorize(texto)
+
+    tokens = pd.Series(unicos).str.split(",").explode().str.strip()
+    tokens = tokens[tokens != ""]
+    por_texto = tokens.groupby(level=0).agg(frozenset)
+    conjuntos = [por_texto.get(k, frozenset()) for k in range(len(unicos))]
+
+    # Tabla por conjunto → entradas planas (especialidad, peso) y su rango por texto
+    por_conj = {c: list(calcular_pesos(c, compilada).items()) for c in set(conjuntos)}
+    ent      = [por_conj[c] for c in conjuntos]
+    n_ent = np.array([len(e) for e in ent], dtype=np.int64)
+    plano = [x for e in ent for x in e]
+    esp_u = np.array([e for e, _ in plano], dtype=object)
+    peso_u = np.array([p for _, p in plano], dtype=float)
+    offs  = np.concatenate(([0], np.cumsum(n_ent)[:-1])) if len(n_ent) else n_ent
+
+    reps   = n_ent[cod]
+    pos    = np.repeat(np.arange(len(cod)), reps)
+    inicio = np.repeat(np.cumsum(reps) - reps, reps)
+    idx    = np.repeat(offs[cod], reps) + (np.arange(reps.sum()) - inicio)
+    return pos, esp_u[idx], peso_u[idx]
+
+
+def repartir_horas(cron: pd.DataFrame, pesos: dict = None):
+    """
+    Kernel común de 3C y 3D-A: en una sola pasada devuelve
+      dividido    → una fila por OT-especialidad con sus horas redondeadas
+      tecnicos_ot → horas y técnicos requeridos por OT-especialidad
+    `pesos` es la tabla conjunto → pesos ya compilada con compilar_pesos()
+    (por defecto PESOS_ESPECIALIDAD).
+    """
+    HORAS_TECNICO = 8
+
+    pos, esp, peso = _repartir_especialidades(cron["especialidad"], pesos)
+    dividido = cron.iloc[pos].reset_index(drop=True)
+    dur      = dividido["duracion_h"].to_numpy()
+    horas    = np.round(dur * peso, 2)
+    horas_redondeadas = _redondear_hora(horas)
+
+    tecnicos_ot = pd.DataFrame({
+        "Orden": dividido["orden"].to_numpy(),
+        "Actividad": dividido["actividad"].to_numpy(),
+        "Centro": dividido["centro"].to_numpy(),
+        "Especialidad": esp,
+        "Duracion_h": dur,
+        "Horas_Especialidad": horas,
+        "Horas_Redondeadas": horas_redondeadas,
+        "Tecnicos_Requeridos": np.ceil(horas_redondeadas / HORAS_TECNICO).astype(int),
+    })
+
+    dividido["especialidad"] = pd.Categorical(esp)
+    dividido["duracion_h"]   = horas_redondeadas
+    return dividido, tecnicos_ot
+
+
+def tecnicos_por_ot(df, pesos=None):
+    return repartir_horas(df, pesos)[1]
+
+# ─────────────────────────────────────────────────────────
+# MÓDULO 3D-A – DIVISIÓN DE ESPECIALIDADES (CORREGIDO)
+# ─────────────────────────────────────────────────────────
+
+def dividir_especialidades(cron, pesos=None):
+    return repartir_horas(cron, pesos)[0]
+    
+# ─────────────────────────────────────────────────────────
+# MÓDULO 3D – OPTIMIZADOR DE TÉCNICOS (VERSIÓN FINAL)
+# ─────────────────────────────────────────────────────────
+
+def optimizar_tecnicos_turnos(cron, horizonte=36, calendario: CalendarioTurnos = None,
+                              bloques: bool = False):
+    """
+    Matriz técnico × hora SD con la OT asignada, como MatrizTecnicos (códigos
+    int32 + tabla de órdenes). Con `bloques=True` devuelve además sus bloques
+    continuos (bloques_tecnicos).
+    """
+
+    calendario = calendario or CalendarioTurnos(horizonte)
+    horizonte  = calendario.horizonte
+    cuadrillas = calendario.cuadrillas_tecnicos
+    TURNOS = {k: calendario.ventanas(k) for k in cuadrillas}  # Tramos de trabajo por cuadrilla
+    HORAS_TECNICO = max(1, calendario.horas_tecnico())         # Capacidad total por técnico
+
+    hh_restantes = cron["duracion_h"].to_numpy().astype(np.int64)
+    ord_cod, ord_lab = pd.factorize(cron["orden"], use_na_sentinel=False)
+
+    # Calcular demanda por centro y especialidad
+    grupos  = cron.groupby(["centro","especialidad"], observed=True)
+    demanda = grupos["duracion_h"].sum()
+    n_tec   = np.ceil(demanda / HORAS_TECNICO).astype(int)
+
+    # Max-heap de OT pendientes por (centro, especialidad): (-hh_restantes, posición)
+    heaps = {}
+    for clave, pos in grupos.indices.items():
+        heaps[clave] = [(-hh_restantes[p], p) for p in pos if hh_restantes[p] > 0]
+        heapq.heapify(heaps[clave])
+
+    # Matriz codificada: 0 = libre, k = ord_lab[k-1]
+    codigos = np.zeros((int(n_tec.sum()), horizonte), dtype=np.int32)
+    nombres = []
+
+    # Recorrer técnicos
+    for (centro, esp), n in n_tec.items():
+        heap = heaps[(centro, esp)]
+
+        for i in range(n):
+            fila = len(nombres)
+            nombres.append(f"{centro}_{esp}_T{i+1}")
+            ot = None  # OT pendiente del técnico, se retoma en el siguiente turno
+
+            for inicio, fin in TURNOS[cuadrillas[i % len(cuadrillas)]]:
+                h = inicio
+
+                while h < fin:
+                    if ot is None:
+                        if not heap:
+                            break
+                        _, ot = heapq.heappop(heap)
+
+                    # Bloque a asignar: mínimo entre horas del turno y horas restantes de la OT
+                    bloque = min(fin - h, hh_restantes[ot])
+                    codigos[fila, h:h + bloque] = ord_cod[ot] + 1
+                    hh_restantes[ot] -= bloque
+                    h += bloque
+
+                    if hh_restantes[ot] == 0:
+                        ot = None
+
+            # La OT que quedó a medias vuelve a la cola para el siguiente técnico
+            if ot is not None:
+                heapq.heappush(heap, (-hh_restantes[ot], ot))
+
+    matriz = MatrizTecnicos(codigos, nombres, ord_lab)
+    return (matriz, matriz.bloques()) if bloques else matriz
+
+
+class MatrizTecnicos:
+    """
+    Matriz técnico × hora SD guardada como códigos int32 (0 = libre, k = ordenes[k-1])
+    más la tabla de órdenes. Filtrar es indexar enteros; las etiquetas de texto
+    solo se materializan al mostrarla (etiquetas()).
+
+    Los índices de centro y OT se calculan una vez, y las vistas filtradas, sus
+    etiquetas y bloques quedan memorizados en la instancia (que vive en la
+    sesión a través de CacheEtapas): repetir un filtro no recalcula nada. Lo
+    que devuelven es compartido; no modificarlo.
+    """
+
+    MAX_VISTAS = 16  # vistas filtradas memorizadas (LRU)
+
+    def __init__(self, codigos: np.ndarray, tecnicos, ordenes, horas=None, _indice_ot: dict = None):
+        self.codigos  = np.asarray(codigos, dtype=np.int32)
+        self.tecnicos = pd.Index(tecnicos, name="tecnico")
+        self.ordenes  = np.asarray(ordenes, dtype=object)
+        self.horas    = np.arange(self.codigos.shape[1]) if horas is None else np.asarray(horas)
+        self.centros  = self.tecnicos.str.split("_").str[0].to_numpy()
+        self.lista_centros = np.unique(self.centros).tolist()
+        # OT como texto → código (la tabla de órdenes se comparte con las vistas)
+        self._indice_ot = _indice_ot if _indice_ot is not None else {
+            str(o): k + 1 for k, o in reversed(list(enumerate(self.ordenes)))}
+        self._vistas = OrderedDict()
+        self._etiquetas = self._bloques = None
+
+    @classmethod
+    def desde_etiquetas(cls, matriz: pd.DataFrame) -> "MatrizTecnicos":
+        """Codifica una matriz de etiquetas ("" = libre) técnico × hora."""
+        cod, ordenes = pd.factorize(matriz.to_numpy().ravel(), use_na_sentinel=False)
+        libre = np.flatnonzero(ordenes == "")
+        # código 0 = libre; el resto se corre en uno para indexar `ordenes` con k-1
+        cod = (cod + 1).astype(np.int32)
+        if len(libre):
+            cod[cod == libre[0] + 1] = 0
+        return cls(cod.reshape(matriz.shape), matriz.index, ordenes,
+                   matriz.columns.to_numpy(dtype=np.int64))
+
+    @property
+    def shape(self):
+        return self.codigos.shape
+
+    def __len__(self):
+        return len(self.tecnicos)
+
+    def __repr__(self):
+        return f"MatrizTecnicos({len(self)} técnicos × {len(self.horas)} h, {len(self.ordenes)} OT)"
+
+    def codigo(self, orden) -> int:
+        """Código de la OT `orden` (comparada como texto); -1 si no está."""
+        return self._indice_ot.get(str(orden), -1)
+
+    def opciones_orden(self) -> list:
+        """OT presentes como texto ordenado (para selectores)."""
+        return sorted(t for t, k in self._indice_ot.items() if pd.notna(self.ordenes[k - 1]))
+
+    def filtrar(self, centros=None, orden=None) -> "MatrizTecnicos":
+        """Técnicos de `centros` (todos si vacío); con `orden`, el resto de OT queda libre."""
+        clave = (tuple(sorted(centros)) if centros else (), None if orden is None else str(orden))
+        if clave == ((), None):
+            return self
+        if clave in self._vistas:
+            self._vistas.move_to_end(clave)
+            return self._vistas[clave]
+
+        filas = np.isin(self.centros, clave[0]) if clave[0] else slice(None)
+        cod = self.codigos[filas]
+        if orden is not None:
+            cod = np.where(cod == self.codigo(orden), cod, 0).astype(np.int32)
+        vista = MatrizTecnicos(cod, self.tecnicos[filas], self.ordenes, self.horas, self._indice_ot)
+        self._vistas[clave] = vista
+        if len(self._vistas) > self.MAX_VISTAS:
+            self._vistas.popitem(last=False)
+        return vista
+
+    def recorte(self, filas: slice, horas: slice) -> "MatrizTecnicos":
+        """Ventana de técnicos × horas (vista paginada); comparte la tabla de órdenes."""
+        return MatrizTecnicos(self.codigos[filas, horas], self.tecnicos[filas], self.ordenes,
+                              self.horas[horas], self._indice_ot)
+
+    def resaltar(self, orden) -> np.ndarray:
+        """Máscara booleana técnico × hora de las celdas con la OT `orden`."""
+        return self.codigos == self.codigo(orden)
+
+    def vacia(self) -> bool:
+        return not self.codigos.any()
+
+    def etiquetas(self) -> pd.DataFrame:
+        """DataFrame técnico × hora con el texto de la OT ("" = libre)."""
+        if self._etiquetas is None:
+            tabla = np.concatenate(([""], self.ordenes))
+            self._etiquetas = pd.DataFrame(tabla[self.codigos], index=self.tecnicos,
+                                           columns=list(self.horas))
+        return self._etiquetas
+
+    def bloques(self) -> pd.DataFrame:
+        if self._bloques is None:
+            self._bloques = bloques_tecnicos(self.codigos, self.tecnicos, self.ordenes, self.horas)
+        return self._bloques
+
+
+def bloques_tecnicos(codigos: np.ndarray, tecnicos, ordenes, horas=None) -> pd.DataFrame:
+    """
+    Run-length de la matriz codificada (0 = libre, k = ordenes[k-1]): un bloque
+    por tramo continuo de la misma OT en un técnico, todos en una pasada.
+    Devuelve tecnico, orden, ini_h, fin_h (fin exclusivo) en horas SD.
+    """
+    n, h = codigos.shape
+    ext = np.zeros((n, h + 2), dtype=codigos.dtype)  # ceros a ambos lados cierran cada tramo
+    ext[:, 1:-1] = codigos
+    fila, col = np.nonzero(np.diff(ext, axis=1))    # orden por fila y hora
+    val = ext[fila, col + 1]
+    abre = np.flatnonzero(val != 0)                  # cada tramo no libre termina en el cambio siguiente
+    ini, fin = col[abre], col[abre + 1]              # columnas [ini, fin)
+    if horas is not None:                            # columnas con su hora SD (matriz recortada)
+        horas = np.asarray(horas)
+        ini, fin = horas[ini], horas[fin - 1] + 1
+    return pd.DataFrame({
+        "tecnico": np.asarray(tecnicos, dtype=object)[fila[abre]],
+        "orden":   pd.Series(np.asarray(ordenes, dtype=object)[val[abre] - 1]).infer_objects(),
+        "ini_h":   ini,
+        "fin_h":   fin,
+    })
+
+
+def bloques_desde_matriz(matriz: pd.DataFrame) -> pd.DataFrame:
+    """bloques_tecnicos() de una matriz de etiquetas (p. ej. ya filtrada)."""
+    return MatrizTecnicos.desde_etiquetas(matriz).bloques()
+    
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 4: CURVA S
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _primer_paso(t: np.ndarray, x: np.ndarray, resolucion: float) -> np.ndarray:
+    """searchsorted(t, x, "left") para la malla uniforme t = k·resolucion, sin búsqueda binaria."""
+    k = np.clip(np.ceil(x / resolucion), 0, len(t)).astype(np.int64)
+    # corrige el redondeo de coma flotante en los bordes de paso
+    k -= (k > 0) & (t[np.maximum(k - 1, 0)] >= x)
+    k += (k < len(t)) & (t[np.minimum(k, len(t) - 1)] < x)
+    return k
+
+
+def curva_s_lote(ini: np.ndarray, fin: np.ndarray, vgn: np.ndarray, dur: np.ndarray,
+                 horizonte: float, resolucion: float = 1.0):
+    """
+    Curva S de S escenarios a la vez: ini/fin/dur de forma (S, N), vgn (N,).
+    Devuelve (t, avance (S, pasos) en 0-1, actividades completas (S, pasos)).
+
+    Barrido O(S·(N + H)): cada actividad aporta a·t + b en [inicio, fin) y su valor
+    completo desde `fin`; ambos términos se acumulan en arreglos de diferencias
+    (un bincount por término sobre el índice escenario·pasos + paso). Si
+    `resolucion` no divide a `horizonte`, el último paso es más corto y cae justo
+    en `horizonte`.
+    """
+    n_pasos = int(np.ceil(horizonte / resolucion - 1e-9)) + 1
+    t       = np.minimum(np.arange(n_pasos) * resolucion, horizonte)
+    n_esc   = ini.shape[0]
+    pend_v  = np.broadcast_to(vgn, ini.shape) / np.maximum(dur, 1)
+
+    # Primer paso k con t[k] >= x: en curso si k_ini <= k < k_fin, completa si k >= k_fin
+    base  = (np.arange(n_esc) * (n_pasos + 1))[:, None]
+    k_ini = (_primer_paso(t, ini, resolucion) + base).ravel()
+    k_fin = (_primer_paso(t, fin, resolucion) + base).ravel()
+
+    def acum(*pares):
+        m = n_esc * (n_pasos + 1)
+        d = sum(np.bincount(k, w.ravel(), minlength=m) for k, w in pares)
+        return np.cumsum(d.reshape(n_esc, n_pasos + 1), axis=1)[:, :n_pasos]
+
+    pend  = acum((k_ini, pend_v), (k_fin, -pend_v))
+    orden = acum((k_ini, -pend_v * ini), (k_fin, pend_v * ini))
+    comp  = acum((k_fin, np.broadcast_to(vgn, ini.shape)))
+    n_comp = acum((k_fin, np.ones(ini.shape))).round().astype(np.int64)
+    return t, comp + pend * t + orden, n_comp
+
+
+def curva_s(df: pd.DataFrame, horizonte: int = 51, resolucion: float = 1.0) -> pd.DataFrame:
+    """
+    Avance acumulado en cada instante de 0 a `horizonte` (paso `resolucion` horas,
+    p. ej. 0.25 para cubos de 15 min): valor completo de las actividades terminadas
+    más el prorrateo lineal de las que están en curso.
+    """
+    t, av, n_comp = curva_s_lote(df["start_sd"].to_numpy(dtype=float)[None, :],
+                                 df["end_sd"].to_numpy(dtype=float)[None, :],
+                                 df["valor_global_norm"].to_numpy(dtype=float),
+                                 df["duracion_h"].to_numpy(dtype=float)[None, :],
+                                 horizonte, resolucion)
+    av, n_comp = av[0], n_comp[0]
+
+    return pd.DataFrame({
+        "hora_sd": t.astype(int) if float(resolucion).is_integer() else t,
+        "hora_real": INICIO_SD + pd.to_timedelta(t, unit="h"),
+        "avance_acum": np.minimum(av * 100, 100).round(2),
+        "acts_completas": n_comp,
+    })
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 5: KPIs
+# ─────────────────────────────────────────────────────────────────────────────
+
+def calcular_kpis(df: pd.DataFrame) -> dict:
+    """
+    KPIs por centro y globales de un programa en una sola agregación: un
+    groupby por centro con reductores nativos (sum / max, sin lambdas) y los
+    totales a partir de esa tabla. Devuelve {"por_centro": DataFrame, ...globales}.
+    """
+    valores = pd.DataFrame({
+        "N_Act":      np.ones(len(df), dtype=np.int64),
+        "Horas":      df["duracion_h"].to_numpy(dtype=float),
+        "Criticas":   df["es_critica"].to_numpy(dtype=np.int64),
+        "RC_Orig":    (df["ruta_critica"] == "SI").to_numpy(dtype=np.int64),
+        "Makespan":   df["end_sd"].to_numpy(),
+        "Dentro_36H": df["dentro_horizonte"].to_numpy(dtype=np.int64),
+        "Valor_Pct":  df["valor_global_norm"].to_numpy(dtype=float),
+    })
+    por_centro = valores.groupby(df["centro"].to_numpy(), sort=True).agg(
+        {"N_Act": "sum", "Horas": "sum", "Criticas": "sum", "RC_Orig": "sum",
+         "Makespan": "max", "Dentro_36H": "sum", "Valor_Pct": "sum"})
+    por_centro.index.name = "centro"
+
+    total = por_centro.sum()
+    makespan = int(por_centro["Makespan"].max()) if len(por_centro) else 0
+    por_centro["Valor_Pct"] = (por_centro["Valor_Pct"] * 100).round(2)
+    por_centro["Pct_Cumpl"] = (por_centro["Dentro_36H"] / por_centro["N_Act"] * 100).round(1)
+    return {
+        "por_centro":  por_centro.reset_index(),
+        "n_act":       int(total["N_Act"]),
+        "n_criticas":  int(total["Criticas"]),
+        "n_dentro":    int(total["Dentro_36H"]),
+        "pct_dentro":  float(total["Dentro_36H"] / total["N_Act"] * 100) if len(df) else 0.0,
+        "horas":       float(round(total["Horas"], 6)),
+        "makespan":    makespan,
+        "fin":         INICIO_SD + timedelta(hours=makespan),
+        "n_centros":   len(por_centro),
+        "centro_mayor_carga": por_centro["Horas"].idxmax() if len(por_centro) else None,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 6: EXPORTAR EXCEL / CSV / PARQUET
+# ─────────────────────────────────────────────────────────────────────────────
+
+FILAS_POR_BLOQUE = 5000  # filas que se convierten a la vez al escribir una hoja
+
+
+def _hojas_exportacion(df: pd.DataFrame, matriz: "MatrizTecnicos" = None, cs: pd.DataFrame = None,
+                       kpis: dict = None):
+    """
+    (nombre, columnas, bloques) de cada hoja en orden; `bloques` es un iterador
+    de DataFrames de a lo sumo FILAS_POR_BLOQUE filas, así ninguna hoja se
+    materializa entera en formato de salida. Resumen y Métricas salen de
+    `kpis` (calcular_kpis(df) si no se pasa).
+    """
+    cols = ["id","centro","actividad","orden","especialidad","ejecutor",
+            "criticidad","criticidad_num","riesgo_texto","riesgo_num",
+            "duracion_h","start_sd","end_sd","turno",
+            "valor_global","valor_global_norm","acum_centro_calc","acum_total_calc",
+            "ruta_critica","es_critica","holgura_h","dentro_horizonte","avance_pct","score","prioridad"]
+    df_e = df[[c for c in cols if c in df.columns]].copy()
+    for col in ["valor_global_norm","acum_centro_calc","acum_total_calc"]:
+        if col in df_e.columns:
+            df_e[col] = df_e[col].clip(upper=100).round(3)
+
+    ren = {"id":"ID","centro":"Centro","actividad":"Actividad","orden":"Orden SAP",
+           "especialidad":"Especialidad","ejecutor":"Ejecutor","criticidad":"Criticidad",
+           "criticidad_num":"Crit. Num","riesgo_texto":"Riesgo","riesgo_num":"Riesgo Num",
+           "duracion_h":"Duración (h)","start_sd":"Inicio SD","end_sd":"Fin SD","turno":"Turno",
+           "valor_global":"Valor Global","valor_global_norm":"Valor Global %",
+           "acum_centro_calc":"% Acum Centro","acum_total_calc":"% Acum Total",
+           "ruta_critica":"RC Orig","es_critica":"RC Calc","holgura_h":"Holgura (h)",
+           "dentro_horizonte":"Dentro 36H","avance_pct":"Avance %",
+           "score":"Score","prioridad":"Prioridad"}
+    df_e = df_e.rename(columns={k:v for k,v in ren.items() if k in df_e.columns})
+
+    k = kpis or calcular_kpis(df)
+    resumen  = k["por_centro"]
+    metricas = pd.DataFrame({
+        "Métrica":["Total Actividades","RC (calc)","Makespan SD","Dentro 36H",
+                   "% Cumplimiento","Centro mayor carga","Inicio SD","Fin estimado","Horas totales"],
+        "Valor":[k["n_act"], k["n_criticas"], k["makespan"], k["n_dentro"],
+                 f"{k['pct_dentro']:.1f}%", k["centro_mayor_carga"],
+                 "18/03/2026 06:00", k["fin"].strftime("%d/%m/%Y %H:%M"), int(k["horas"])]
+    })
+
+    def trozos(tabla):
+        for i in range(0, len(tabla), FILAS_POR_BLOQUE):
+            yield tabla.iloc[i:i + FILAS_POR_BLOQUE]
+
+    hojas = [("Cronograma", df_e), ("Resumen Centro", resumen), ("Métricas", metricas)]
+    if "es_critica" in df.columns and df["es_critica"].any():
+        rc = df[df["es_critica"].to_numpy(dtype=bool)]
+        hojas.append(("Ruta Crítica", rc[[c for c in cols if c in rc.columns]].rename(columns=ren)))
+    for nombre, tabla in hojas:
+        yield nombre, list(tabla.columns), trozos(tabla)
+
+    if matriz is not None:
+        def trozos_matriz():
+            for i in range(0, len(matriz), FILAS_POR_BLOQUE):
+                sub = MatrizTecnicos(matriz.codigos[i:i + FILAS_POR_BLOQUE],
+                                     matriz.tecnicos[i:i + FILAS_POR_BLOQUE], matriz.ordenes,
+                                     matriz.horas, matriz._indice_ot)
+                yield sub.etiquetas().reset_index()
+        yield "Técnicos por hora", ["tecnico"] + list(matriz.horas), trozos_matriz()
+    if cs is not None:
+        yield "Curva S", list(cs.columns), trozos(cs)
+
+
+def exportar_excel(df: pd.DataFrame, matriz: "MatrizTecnicos" = None, cs: pd.DataFrame = None,
+                   destino=None, kpis: dict = None):
+    """
+    Libro con Cronograma, Resumen Centro, Métricas, Ruta Crítica y, si se pasan,
+    la matriz de técnicos por hora y la curva S. XlsxWriter en modo
+    constant_memory: cada fila se vuelca a disco al escribirse y el libro no
+    queda en memoria. Con `destino` (ruta o archivo) se escribe ahí; si no,
+    devuelve los bytes.
+    """
+    import xlsxwriter
+
+    buf = destino if destino is not None else io.BytesIO()
+    wb  = xlsxwriter.Workbook(buf, {"constant_memory": True, "default_date_format": "dd/mm/yyyy hh:mm"})
+    negrita = wb.add_format({"bold": True, "border": 1})
+    for nombre, columnas, bloques in _hojas_exportacion(df, matriz, cs, kpis):
+        ws = wb.add_worksheet(nombre)
+        ws.write_row(0, 0, columnas, negrita)
+        fila = 1
+        for b in bloques:
+            # NaN/NaT → celda vacía, categorías y numpy → tipos de Python
+            for valores in b.astype(object).where(b.notna(), None).itertuples(index=False, name=None):
+                ws.write_row(fila, 0, valores)
+                fila += 1
+    wb.close()
+    return None if destino is not None else buf.getvalue()
+
+
+def _parquet_por_bloques(fh, columnas, bloques):
+    """
+    Escribe los bloques de una hoja como grupos de filas de un mismo Parquet
+    (ParquetWriter), sin juntar la hoja entera. El esquema sale del primer
+    bloque; las columnas object (texto, OT vacías "" de la matriz, Métricas con
+    texto y números) van siempre como texto para que todos los bloques lo
+    compartan, y los nombres de columna también.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    for b in bloques:
+        b = b.rename(columns=str)
+        texto = [c for c in b.columns if b[c].dtype == object]
+        b[texto] = b[texto].astype(str).where(b[texto].notna(), None)
+        tabla = pa.Table.from_pandas(b, preserve_index=False)
+        if escritor is None:
+            esquema = pa.schema([pa.field(f.name, pa.string()) if f.name in texto else f
+                                 for f in tabla.schema], metadata=tabla.schema.metadata)
+            escritor = pq.ParquetWriter(fh, esquema)
+        escritor.write_table(tabla.cast(esquema))
+    if escritor is None:  # hoja sin filas: solo las columnas
+        pd.DataFrame(columns=[str(c) for c in columnas]).to_parquet(fh, index=False)
+    else:
+        escritor.close()
+
+
+def exportar_tablas(df: pd.DataFrame, matriz: "MatrizTecnicos" = None, cs: pd.DataFrame = None,
+                    formato: str = "csv", destino=None, kpis: dict = None):
+    """
+    Las mismas hojas que exportar_excel() como un .zip con un archivo por hoja,
+    `formato` "csv" (UTF-8 con BOM, abre directo en Excel) o "parquet".
+    """
+    if formato not in ("csv", "parquet"):
+        raise ValueError(f"Formato no soportado: {formato!r} (use 'csv' o 'parquet')")
+    buf = destino if destino is not None else io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, columnas, bloques in _hojas_exportacion(df, matriz, cs, kpis):
+            archivo = f"{nombre}.{formato}"
+            if formato == "parquet":
+                with zf.open(archivo, "w") as fh:
+                    _parquet_por_bloques(fh, columnas, bloques)
+                continue
+            with zf.open(archivo, "w") as fh, io.TextIOWrapper(fh, encoding="utf-8-sig", newline="") as txt:
+                pd.DataFrame(columns=columnas).to_csv(txt, index=False)
+                for b in bloques:
+                    b.to_csv(txt, index=False, header=False)
+    return None if destino is not None else buf.getvalue()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÓDULO 7: PIPELINE INCREMENTAL
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _huella(*partes) -> str:
+    return hashlib.sha256(repr(partes).encode()).hexdigest()
+
+
+class CacheEtapas:
+    """
+    Memoriza cada etapa del pipeline por una huella de sus entradas: la huella
+    de la etapa anterior más sus propios parámetros. Así mover un peso solo
+    re-ejecuta scoring y lo que sigue, y cambiar riesgo_thr reutiliza carga,
+    limpieza y scoring. Guarda los `max_por_etapa` resultados más recientes.
+    """
+
+    def __init__(self, max_por_etapa: int = 4):
+        self.max_por_etapa = max_por_etapa
+        self._datos = {}
+
+    def etapa(self, nombre: str, huella: str, fn, *args):
+        memo = self._datos.setdefault(nombre, OrderedDict())
+        if huella in memo:
+            memo.move_to_end(huella)
+            return memo[huella]
+        res = fn(*args)
+        memo[huella] = res
+        if len(memo) > self.max_por_etapa:
+            memo.popitem(last=False)
+        return res
+
+
+def ejecutar_pipeline(b_act: bytes, b_pdt: bytes, w_crit, w_riesgo, w_valor, w_dur,
+                      riesgo_thr, motor="Greedy", t_lim=30, cache: CacheEtapas = None,
+                      pesos_esp: dict = None, calendario: CalendarioTurnos = None,
+                      resolucion: float = 1.0) -> dict:
+    """
+    carga → limpieza → scoring → programación → curva S / técnicos, por etapas
+    memorizadas. `pesos_esp` reemplaza la tabla PESOS_ESPECIALIDAD,
+    `calendario` el calendario de turnos por defecto y `resolucion` es el paso
+    (h) de la curva S.
+    """
+    cache = cache or CacheEtapas()
+    calendario = calendario or CalendarioTurnos()
+
+    k_lim = _huella("limpio", hashlib.sha256(b_act).hexdigest(), hashlib.sha256(b_pdt).hexdigest())
+    limpio = cache.etapa("limpio", k_lim,
+                         lambda: limpiar_unificar(cargar_actividades(b_act), cargar_pdt(b_pdt)))
+
+    k_sc = _huella(k_lim, w_crit, w_riesgo, w_valor, w_dur)
+    m = cache.etapa("scoring", k_sc, scoring, limpio, w_crit, w_riesgo, w_valor, w_dur)
+
+    if motor == "Greedy":
+        k_pr = _huella(k_sc, riesgo_thr, motor, calendario)
+        prog = cache.etapa("programa", k_pr, programar, m, None, riesgo_thr, calendario)
+    else:
+        k_pr = _huella(k_sc, riesgo_thr, motor, t_lim, calendario)
+        prog = cache.etapa("programa", k_pr, programar_cpsat, m, riesgo_thr, t_lim,
+                           os.cpu_count() or 8, calendario)
+
+    return {"limpio": limpio, **_etapas_finales(cache, k_pr, prog, pesos_esp, calendario, resolucion)}
+
+
+def _etapas_finales(cache: CacheEtapas, k_pr: str, prog, pesos_esp, calendario,
+                    resolucion: float = 1.0) -> dict:
+    """Curva S, reparto por especialidad, matriz de técnicos y KPIs a partir del programa."""
+    cs = cache.etapa("curva_s", _huella(k_pr, resolucion), curva_s, prog,
+                     max(51, int(prog["end_sd"].max())), resolucion)
+
+    k_rep = _huella(k_pr, _items_pesos(pesos_esp))
+    cron, tots = cache.etapa("reparto", k_rep, repartir_horas, prog, compilar_pesos(pesos_esp))
+    mat, bloq  = cache.etapa("matriz",  k_rep, optimizar_tecnicos_turnos, cron, None, calendario, True)
+    kpis       = cache.etapa("kpis",    k_pr,  calcular_kpis, prog)  # una fila por actividad
+
+    return {"programa": prog, "cron": cron, "cs": cs, "tecnicos_ot": tots, "kpis": kpis,
+            "matriz_tecnicos": mat, "bloques_tecnicos": bloq, "motor": prog.attrs.get("motor", "Greedy")}
+
+
+def ejecutar_replan(b_pdt: bytes, prog: pd.DataFrame, ahora: int, riesgo_thr,
+                    cache: CacheEtapas = None, pesos_esp: dict = None,
+                    calendario: CalendarioTurnos = None, escala_avance: str = "porcentaje",
+                    resolucion: float = 1.0) -> dict:
+    """
+    Re-plan desde la hora SD `ahora`: toma el avance actualizado del PDT `b_pdt`
+    (por ID de actividad, en la `escala_avance` indicada) y repara el programa
+    vigente `prog` con replanificar(). `resolucion` es el paso (h) de la curva S.
+    """
+    cache = cache or CacheEtapas()
+    calendario = calendario or CalendarioTurnos()
+
+    k_av  = _huella("avance", hashlib.sha256(b_pdt).hexdigest())
+    pdt   = _id_por_fila(cache.etapa("avance", k_av, cargar_pdt, b_pdt).rename(columns=COLUMNAS_PDT))
+    av_id = (pdt.assign(id_pdt=pd.to_numeric(pdt["id_pdt"], errors="coerce"))
+             .dropna(subset=["id_pdt"]).drop_duplicates("id_pdt")
+             .set_index("id_pdt")["avance_pct"])
+    avance = pd.Series(av_id.reindex(prog["id_pdt"].astype(float)).to_numpy(), index=prog.index)
+
+    k_pr = _huella(k_av, pd.util.hash_pandas_object(prog[["id", "start_sd", "end_sd"]]).sum(),
+                   ahora, riesgo_thr, calendario, escala_avance)
+    prog = cache.etapa("programa", k_pr, replanificar, prog, ahora, avance, riesgo_thr, calendario,
+                       escala_avance)
+    return _etapas_finales(cache, k_pr, prog, pesos_esp, calendario, resolucion)
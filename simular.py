@@ -0,0 +1,167 @@
+"""
+=============================================================================
+SIMULACIÓN PARADA DE PLANTA SD18MAR26 - EJECUCIÓN SIN INTERFAZ
+Corre el mismo pipeline que el dashboard y escribe el resultado a disco
+(re-planes nocturnos desde cron, lotes). No importa Streamlit ni Plotly.
+=============================================================================
+Uso:
+    python simular.py actividades.xlsx pdt.xlsx -o plan.xlsx
+    python simular.py actividades.xlsx pdt.xlsx -o plan.parquet --riesgo-thr 4
+    python simular.py actividades.xlsx pdt.xlsx -o plan.json --motor cpsat --tiempo-limite 60
+    python simular.py actividades.xlsx pdt.xlsx -o plan.zip
+    python simular.py actividades.xlsx pdt.xlsx -o barrido.xlsx --barrido 500
+    python simular.py actividades.xlsx pdt.xlsx -o plan.xlsx --horizonte 336 --turno 12 --descanso 12
+    python simular.py actividades.xlsx pdt_hoy.xlsx -o plan2.parquet --plan-vigente plan.parquet --replan-desde 20
+    python simular.py actividades.xlsx pdt.xlsx -o plan.xlsx --montecarlo 5000
+    python simular.py actividades.xlsx pdt.xlsx -o plan.xlsx --resolucion 0.25
+
+El formato sale de la extensión: .xlsx (exportar_excel, con técnicos por hora
+y curva S), .zip (las mismas hojas en CSV), .parquet o .json (cronograma, una
+fila por actividad). Con --barrido N se escribe en su lugar
+el ranking de N combinaciones aleatorias de pesos y umbral. Con --replan-desde H
+se repara el plan vigente (.parquet/.json de una corrida anterior) desde la
+hora SD H con el avance del PDT (en 0-100 o, con --avance-escala fraccion,
+en 0-1): terminadas y en curso quedan fijas. Con
+--montecarlo N se añaden P50/P80/P90 de fin de parada sobre N escenarios de
+duración (y la curva S probabilística en <salida>_riesgo.csv). --resolucion
+fija el paso (h) de ambas curvas S, p. ej. 0.25 para cubos de 15 min.
+=============================================================================
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from simulacion import (ESCALAS_AVANCE, CalendarioTurnos, cargar_actividades, cargar_pdt, ejecutar_pipeline,
+                        ejecutar_replan, exportar_excel, exportar_tablas, leer_tabla_pesos,
+                        limpiar_unificar)
+
+FORMATOS = (".xlsx", ".zip", ".parquet", ".json")
+
+
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Simulación parada de planta sin interfaz")
+    p.add_argument("actividades", type=Path, help="Listado de actividades (hoja 'Lista de Actividades SD')")
+    p.add_argument("pdt", type=Path, help="PDT paro de bombeo (hoja 'Actividades')")
+    p.add_argument("-o", "--salida", type=Path, default=Path("plan.xlsx"),
+                   help="Archivo de salida: " + ", ".join(FORMATOS))
+    p.add_argument("--w-crit",   type=float, default=0.40, help="Peso criticidad")
+    p.add_argument("--w-riesgo", type=float, default=0.30, help="Peso riesgo")
+    p.add_argument("--w-valor",  type=float, default=0.20, help="Peso valor global")
+    p.add_argument("--w-dur",    type=float, default=0.10, help="Penalización duración")
+    p.add_argument("--riesgo-thr", type=int, default=3, help="Umbral criticidad no-solapamiento")
+    p.add_argument("--motor", choices=["greedy", "cpsat"], default="greedy")
+    p.add_argument("--tiempo-limite", type=float, default=30, help="Segundos para CP-SAT")
+    p.add_argument("--pesos", type=Path,
+                   help="CSV/Excel con la tabla conjunto, especialidad, peso para repartir horas")
+    p.add_argument("--horizonte", type=int, default=36, help="Horizonte de la parada (h)")
+    p.add_argument("--turno", type=int, default=8, help="Duración de cada turno (h)")
+    p.add_argument("--descanso", type=int, default=16, help="Descanso mínimo entre turnos de una cuadrilla (h)")
+    p.add_argument("--cuadrillas", type=int,
+                   help="Cuadrillas en rotación (por defecto, las necesarias para cubrir todos los turnos)")
+    p.add_argument("--resolucion", type=float, default=1.0, metavar="H",
+                   help="Paso de la curva S en horas (0.25 = cubos de 15 min)")
+    p.add_argument("--plan-vigente", type=Path, help="Plan anterior (.parquet/.json) para --replan-desde")
+    p.add_argument("--replan-desde", type=int, metavar="H",
+                   help="Re-planificar el plan vigente desde la hora SD H con el avance del PDT")
+    p.add_argument("--avance-escala", choices=list(ESCALAS_AVANCE), default="porcentaje",
+                   help="Escala de 'Avance %% Act.' en el PDT: 0-100 (porcentaje) o 0-1 (fraccion)")
+    p.add_argument("--montecarlo", type=int, metavar="N",
+                   help="Simular N escenarios de duración sobre el plan (P50/P80/P90)")
+    p.add_argument("--barrido", type=int, metavar="N",
+                   help="Evaluar N combinaciones aleatorias de pesos y escribir el ranking")
+    p.add_argument("--procesos", type=int,
+                   help="Procesos para el barrido / Monte Carlo (por defecto, todos los núcleos)")
+    return p
+
+
+def main(argv=None) -> int:
+    parser = _parser()
+    a = parser.parse_args(argv)
+    ext = a.salida.suffix.lower()
+    if ext not in FORMATOS:
+        parser.error(f"formato de salida no soportado: {a.salida.name} (use {', '.join(FORMATOS)})")
+    if a.resolucion <= 0:
+        parser.error("--resolucion debe ser mayor que 0")
+
+    t0 = time.perf_counter()
+    pesos_esp  = leer_tabla_pesos(a.pesos) if a.pesos else None
+    calendario = CalendarioTurnos(a.horizonte, a.turno, a.descanso, a.cuadrillas)
+    if a.barrido:
+        return _barrido(a, ext, t0, calendario, pesos_esp)
+
+    if a.replan_desde is not None:
+        if not a.plan_vigente or a.plan_vigente.suffix.lower() not in (".parquet", ".json"):
+            parser.error("--replan-desde requiere --plan-vigente .parquet o .json")
+        vigente = (pd.read_parquet(a.plan_vigente) if a.plan_vigente.suffix.lower() == ".parquet"
+                   else pd.read_json(a.plan_vigente, orient="records"))
+        res = ejecutar_replan(a.pdt.read_bytes(), vigente, a.replan_desde, a.riesgo_thr,
+                              pesos_esp=pesos_esp, calendario=calendario,
+                              escala_avance=a.avance_escala, resolucion=a.resolucion)
+    else:
+        res = ejecutar_pipeline(
+            a.actividades.read_bytes(), a.pdt.read_bytes(),
+            a.w_crit, a.w_riesgo, a.w_valor, a.w_dur, a.riesgo_thr,
+            "Greedy" if a.motor == "greedy" else "CP-SAT", a.tiempo_limite,
+            pesos_esp=pesos_esp, calendario=calendario, resolucion=a.resolucion,
+        )
+    prog = res["programa"]
+
+    if ext == ".xlsx":
+        exportar_excel(prog, res["matriz_tecnicos"], res["cs"], destino=a.salida, kpis=res["kpis"])
+    elif ext == ".zip":
+        exportar_tablas(prog, res["matriz_tecnicos"], res["cs"], "csv", destino=a.salida,
+                        kpis=res["kpis"])
+    elif ext == ".parquet":
+        prog.to_parquet(a.salida, index=False)
+    else:
+        prog.to_json(a.salida, orient="records", date_format="iso", force_ascii=False, indent=1)
+
+    print(f"{len(prog)} actividades · makespan SD{int(prog['end_sd'].max())} · "
+          f"{res['motor']} · {time.perf_counter() - t0:.1f}s → {a.salida}")
+    if a.montecarlo:
+        _montecarlo(a, prog)
+    return 0
+
+
+def _montecarlo(a, prog) -> None:
+    from exploracion import simular_riesgo
+
+    t0 = time.perf_counter()
+    riesgo = simular_riesgo(prog, a.montecarlo, a.riesgo_thr, resolucion=a.resolucion,
+                            n_procesos=a.procesos)
+    destino = a.salida.with_name(f"{a.salida.stem}_riesgo.csv")
+    riesgo["bandas"].to_csv(destino, index=False)
+    for _, r in riesgo["resumen"].iterrows():
+        print(f"  {r['percentil']}: SD{r['makespan_h']:.1f} · {r['fin']:%d/%m/%Y %H:%M}")
+    print(f"{a.montecarlo} escenarios · {time.perf_counter() - t0:.1f}s → {destino}")
+
+
+def _barrido(a, ext: str, t0: float, calendario: CalendarioTurnos, pesos_esp: dict) -> int:
+    from exploracion import barrido_parametros, muestras_pesos
+
+    limpio  = limpiar_unificar(cargar_actividades(a.actividades.read_bytes()),
+                               cargar_pdt(a.pdt.read_bytes()))
+    ranking = barrido_parametros(limpio, muestras_pesos(a.barrido), a.procesos,
+                                 calendario, pesos_esp)
+
+    if ext == ".xlsx":
+        ranking.to_excel(a.salida, sheet_name="Barrido", index=False)
+    elif ext == ".zip":
+        ranking.to_csv(a.salida, index=False)  # compresión zip por la extensión
+    elif ext == ".parquet":
+        ranking.to_parquet(a.salida, index=False)
+    else:
+        ranking.to_json(a.salida, orient="records", indent=1)
+
+    mejor = ranking.iloc[0]
+    print(f"{len(ranking)} combinaciones · mejor: makespan SD{int(mejor['makespan'])}, "
+          f"avance @SD{calendario.horizonte} {mejor['avance_horizonte']:.1f}% · {time.perf_counter() - t0:.1f}s → {a.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Utilidades comunes de las pruebas: el repositorio en sys.path y un PDT mínimo
+armado a mano (sin Excel) con las columnas que consumen los motores.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def red_csr(n: int, arcos) -> tuple:
+    """(indptr, indices) de sucesoras a partir de arcos (origen, destino) por posición."""
+    arcos = sorted(arcos)
+    origen = np.array([a for a, _ in arcos], dtype=np.int64)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(origen, minlength=n)))).astype(np.int64)
+    return indptr, np.array([b for _, b in arcos], dtype=np.int64)
+
+
+def pdt_mano(duraciones: dict, predecesoras: dict, especialidad="MECANICO", centro="C1") -> pd.DataFrame:
+    """
+    PDT limpio con ID → duración (h) y ID → lista de predecesoras. El score
+    decrece con el ID, así el orden de prioridad es el de los IDs.
+    """
+    ids = list(duraciones)
+    return pd.DataFrame({
+        "id": ids,
+        "id_pdt": ids,
+        "actividad": [f"Actividad {i}" for i in ids],
+        "duracion_h": [duraciones[i] for i in ids],
+        "predecesoras": [";".join(map(str, predecesoras.get(i, []))) or None for i in ids],
+        "sucesoras": None,
+        "especialidad": especialidad,
+        "centro": centro,
+        "criticidad": "Media",
+        "criticidad_num": 2,
+        "riesgo_num": 1,
+        "valor_global": 1.0,
+        "ruta_critica": "NO",
+        "avance_pct": 0.0,
+        "score": -np.arange(len(ids), dtype=float),
+    })
@@ -0,0 +1,39 @@
+"""Lectura del PDT: precedencias por número de fila cuando la hoja no trae ID."""
+
+import io
+
+import openpyxl
+import pandas as pd
+
+from simulacion import COLUMNAS_PDT, _leer_hoja, limpiar_unificar
+
+
+def _libro_pdt(filas) -> bytes:
+    """Hoja "Actividades" con todas las columnas del PDT salvo ID; `filas` da las indicadas."""
+    cabecera = [c for c in COLUMNAS_PDT if c != "ID"]
+    dadas    = ["Actividades", "TIEMPO (Hrs)", "EJECUTOR", "Predecesoras"]
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Actividades"
+    ws.append(cabecera)
+    for fila in filas:
+        valores = dict(zip(dadas, fila))
+        ws.append([valores.get(c) for c in cabecera])
+    b = io.BytesIO()
+    wb.save(b)
+    return b.getvalue()
+
+
+def test_sin_id_las_predecesoras_cuentan_las_filas_vacias():
+    # la fila 2 está vacía: "C" depende de la fila 3 ("B"), no de la tercera leída
+    b = _libro_pdt([["A", 2, "MASSY ENERGY", None],
+                    [None, None, None, None],
+                    ["B", 3, "MASSY ENERGY", "1"],
+                    ["C", 1, "MASSY ENERGY", "3"]])
+    pdt = _leer_hoja(b, "Actividades", tuple(COLUMNAS_PDT), "Actividades")
+    assert pdt["fila_hoja"].tolist() == [1, 3, 4]
+
+    df = limpiar_unificar(pd.DataFrame({"Actividades": ["A", "B", "C"]}), pdt).set_index("actividad")
+    assert df["id_pdt"].tolist() == [1, 3, 4]
+    assert df.loc["C", "predecesoras"] == "3"
+    assert "fila_hoja" not in df
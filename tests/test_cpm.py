@@ -0,0 +1,64 @@
+"""CPM por niveles (Kahn) sobre redes armadas a mano."""
+
+import numpy as np
+import pytest
+
+from conftest import pdt_mano, red_csr
+from simulacion import _ids, calcular_cpm, programar, red_precedencias
+
+
+def _cpm_referencia(dur, n, arcos):
+    """Camino más largo hacia adelante y hacia atrás, nodo a nodo (arcos i < j)."""
+    temprano = np.zeros(n, dtype=np.int64)
+    for a, b in sorted(arcos):
+        temprano[b] = max(temprano[b], temprano[a] + dur[a])
+    fin_red = int((temprano + dur).max())
+    fin_tardio = np.full(n, fin_red, dtype=np.int64)
+    for a, b in sorted(arcos, reverse=True):
+        fin_tardio[a] = min(fin_tardio[a], fin_tardio[b] - dur[b])
+    return temprano, fin_tardio - dur
+
+
+def test_diamante_temprano_tardio_holgura():
+    # A → B → D y A → C → D: C es la única rama con holgura
+    dur = np.array([2, 3, 1, 2])
+    temprano, tardio = calcular_cpm(dur, *red_csr(4, [(0, 1), (0, 2), (1, 3), (2, 3)]))
+    assert temprano.tolist() == [0, 2, 2, 5]
+    assert tardio.tolist() == [0, 2, 4, 5]
+    assert (tardio - temprano).tolist() == [0, 0, 2, 0]
+
+
+def test_actividades_sueltas_tienen_holgura_hasta_el_fin_de_la_red():
+    dur = np.array([4, 1, 6])
+    temprano, tardio = calcular_cpm(dur, *red_csr(3, [(0, 1)]))
+    assert temprano.tolist() == [0, 4, 0]
+    assert (tardio - temprano).tolist() == [1, 1, 0]
+
+
+def test_niveles_igualan_el_camino_mas_largo_en_una_red_aleatoria():
+    rng = np.random.default_rng(7)
+    n = 60
+    arcos = {(int(a), int(b)) for a, b in rng.integers(0, n, (150, 2)) if a < b}
+    dur = rng.integers(1, 9, n)
+    temprano, tardio = calcular_cpm(dur, *red_csr(n, arcos))
+    ref_temprano, ref_tardio = _cpm_referencia(dur, n, arcos)
+    np.testing.assert_array_equal(temprano, ref_temprano)
+    np.testing.assert_array_equal(tardio, ref_tardio)
+    assert (tardio >= temprano).all()
+    # ninguna precedencia se viola con los inicios tempranos
+    assert all(temprano[b] >= temprano[a] + dur[a] for a, b in arcos)
+
+
+def test_ciclo_se_informa_por_id_del_pdt():
+    df = pdt_mano({10: 1, 20: 1, 30: 1, 40: 1}, {20: [10, 30], 30: [20], 40: [30]})
+    red = red_precedencias(df)
+    with pytest.raises(ValueError, match=r"3 actividades .*ID \[20, 30, 40\]"):
+        calcular_cpm(np.ones(4), *red, _ids(df))
+    with pytest.raises(ValueError, match=r"posiciones \[1, 2, 3\]"):
+        calcular_cpm(np.ones(4), *red)
+
+
+def test_programar_rechaza_ciclos_con_los_id():
+    df = pdt_mano({1: 2, 2: 2, 3: 2}, {1: [3], 2: [1], 3: [2]})
+    with pytest.raises(ValueError, match=r"ID \[1, 2, 3\]"):
+        programar(df)
@@ -0,0 +1,21 @@
+"""Motor CP-SAT con horas cerradas del calendario."""
+
+import pytest
+
+from conftest import pdt_mano
+from simulacion import CalendarioTurnos
+
+pytest.importorskip("ortools")
+
+from simulacion import programar_cpsat  # noqa: E402
+
+
+def test_cierre_que_cruza_la_cota_del_modelo_se_respeta():
+    # una cuadrilla en turnos de 4 h con 4 h de descanso: SD4-8 sin nadie; la
+    # única actividad (6 h) daría una cota de 6 h que corta ese cierre
+    cal  = CalendarioTurnos(12, 4, 4, cuadrillas=1)
+    assert cal.tramos_cerrados() == [(4, 8)]
+    prog = programar_cpsat(pdt_mano({1: 6}, {}), tiempo_limite=5, n_workers=1, calendario=cal)
+    assert prog.attrs["motor"].startswith("CP-SAT")
+    inicio, fin = int(prog["start_sd"].iloc[0]), int(prog["end_sd"].iloc[0])
+    assert fin <= 4 or inicio >= 8
@@ -0,0 +1,132 @@
+"""Invariantes del re-plan (replanificar) sobre redes armadas a mano."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import pdt_mano
+from simulacion import CalendarioTurnos, _capacidad, programar, red_precedencias, replanificar
+
+
+def _violaciones(prog: pd.DataFrame) -> int:
+    """Arcos de precedencia en los que la sucesora empieza antes de que termine la predecesora."""
+    df = prog.reset_index(drop=True)
+    indptr, suc = red_precedencias(df)
+    pred = np.repeat(np.arange(len(df)), np.diff(indptr))
+    return int((df["start_sd"].to_numpy()[suc] < df["end_sd"].to_numpy()[pred]).sum())
+
+
+def _sobrecarga(prog: pd.DataFrame, riesgo_thr: int) -> tuple:
+    """(horas-especialidad sobre la capacidad, horas-centro con dos críticas a la vez)."""
+    n = int(prog["end_sd"].max()) + 1
+
+    def simultaneas(g):
+        d = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(d, g["start_sd"].to_numpy(), 1)
+        np.add.at(d, g["end_sd"].to_numpy(), -1)
+        return np.cumsum(d)[:n]
+
+    esp = prog["especialidad"].astype(str).str[:25]
+    exceso = sum(int(np.maximum(simultaneas(g) - _capacidad(k), 0).sum()) for k, g in prog.groupby(esp))
+    altas  = prog[prog["criticidad_num"] >= riesgo_thr]
+    cruce  = sum(int((simultaneas(g) > 1).sum()) for _, g in altas.groupby(altas["centro"].astype(str)))
+    return exceso, cruce
+
+
+def _red_aleatoria(n: int, semilla: int) -> pd.DataFrame:
+    rng = np.random.default_rng(semilla)
+    ids = list(range(1, n + 1))
+    preds = {j: sorted({int(i) for i in rng.integers(1, j, rng.integers(0, 3))}) for j in ids[1:]}
+    df = pdt_mano({i: int(rng.integers(1, 7)) for i in ids}, preds)
+    df["especialidad"] = rng.choice(["MECANICO", "ELECTRICO", "CIVIL"], n)
+    df["centro"] = rng.choice(["C1", "C2", "C3"], n)
+    df["criticidad_num"] = rng.integers(1, 5, n)
+    return df
+
+
+def _avance_a(prog: pd.DataFrame, ahora: int) -> pd.Series:
+    """Avance coherente con el plan a la hora `ahora`, en 0-100."""
+    hecho = (ahora - prog["start_sd"]).clip(lower=0) / (prog["end_sd"] - prog["start_sd"])
+    return (hecho.clip(upper=1) * 100).round()
+
+
+@pytest.mark.parametrize("semilla", [0, 1, 2])
+def test_terminadas_no_se_mueven_y_sin_violaciones(semilla):
+    cal  = CalendarioTurnos(36)
+    prog = programar(_red_aleatoria(40, semilla), riesgo_thr=3, calendario=cal)
+    assert _violaciones(prog) == 0
+    ahora = int(prog["end_sd"].max()) // 2
+    avance = _avance_a(prog, ahora)
+
+    nuevo = replanificar(prog, ahora, avance, riesgo_thr=3, calendario=cal)
+    antes = prog.set_index("id_pdt")
+    despues = nuevo.set_index("id_pdt").loc[antes.index]
+
+    terminadas = (avance == 100).to_numpy()
+    en_curso   = ((avance > 0) & (avance < 100)).to_numpy()
+    assert terminadas.any() and en_curso.any()
+    assert (despues["estado_replan"].to_numpy()[terminadas] == "TERMINADA").all()
+    np.testing.assert_array_equal(despues["start_sd"].to_numpy()[terminadas],
+                                  antes["start_sd"].to_numpy()[terminadas])
+    np.testing.assert_array_equal(despues["end_sd"].to_numpy()[terminadas],
+                                  antes["end_sd"].to_numpy()[terminadas])
+    # en curso: conservan el inicio; el resto no empieza antes de ahora
+    np.testing.assert_array_equal(despues["start_sd"].to_numpy()[en_curso],
+                                  antes["start_sd"].to_numpy()[en_curso])
+    assert (despues["start_sd"].to_numpy()[~(terminadas | en_curso)] >= ahora).all()
+    assert _violaciones(nuevo) == 0
+
+
+def test_replan_sobre_replan_conserva_las_invariantes():
+    cal  = CalendarioTurnos(36)
+    prog = programar(_red_aleatoria(30, 5), riesgo_thr=3, calendario=cal)
+    uno  = replanificar(prog, 6, _avance_a(prog, 6), riesgo_thr=3, calendario=cal)
+    dos  = replanificar(uno, 12, _avance_a(uno, 12), riesgo_thr=3, calendario=cal)
+    fijas = uno.set_index("id_pdt")["end_sd"] <= 12
+    np.testing.assert_array_equal(dos.set_index("id_pdt").loc[fijas[fijas].index, "end_sd"],
+                                  uno.set_index("id_pdt").loc[fijas[fijas].index, "end_sd"])
+    assert _violaciones(dos) == 0
+
+
+def test_escala_porcentaje_no_da_por_terminado_un_uno_por_ciento():
+    cal  = CalendarioTurnos(36)
+    prog = programar(pdt_mano({1: 4, 2: 4, 3: 4}, {2: [1], 3: [2]}), calendario=cal)
+    avance = pd.Series([1.0, 0.0, 0.0], index=prog.index)
+    porcentaje = replanificar(prog, 2, avance, calendario=cal).set_index("id_pdt")
+    fraccion   = replanificar(prog, 2, avance, calendario=cal, escala_avance="fraccion").set_index("id_pdt")
+    assert porcentaje.loc[1, "estado_replan"] == "EN CURSO"
+    assert fraccion.loc[1, "estado_replan"] == "TERMINADA"
+    assert _violaciones(porcentaje) == 0 and _violaciones(fraccion) == 0
+    with pytest.raises(ValueError, match="Escala de avance"):
+        replanificar(prog, 2, avance, calendario=cal, escala_avance="auto")
+
+
+@pytest.mark.parametrize("ahora", [36, 40])
+def test_replan_despues_del_horizonte_respeta_capacidad(ahora):
+    # sin avance todo se re-programa desde `ahora`, ya fuera del horizonte de 36 h
+    cal  = CalendarioTurnos(36)
+    df   = _red_aleatoria(40, 3)
+    df["especialidad"] = np.where(np.arange(40) % 4, "CIVIL", "ELECTRICO")
+    prog = programar(df, riesgo_thr=3, calendario=cal)
+    nuevo = replanificar(prog, ahora, riesgo_thr=3, calendario=cal)
+    assert (nuevo["start_sd"] >= ahora).all()
+    assert _sobrecarga(nuevo, 3) == (0, 0)
+    assert _violaciones(nuevo) == 0
+
+
+
+def test_riesgo_de_una_en_curso_solo_muestrea_lo_que_falta():
+    from exploracion import DISTRIBUCION_DURACION, modelo_riesgo
+
+    cal  = CalendarioTurnos(36)
+    prog = programar(pdt_mano({1: 10, 2: 4}, {2: [1]}), calendario=cal)
+    nuevo = replanificar(prog, 6, pd.Series([50.0, 0.0], index=prog.index), calendario=cal)
+    assert nuevo.attrs["ahora"] == 6
+    curso = nuevo.sort_index()["id_pdt"].to_numpy() == 1
+    assert nuevo.set_index("id_pdt").loc[1, "estado_replan"] == "EN CURSO"
+    # inicio en SD0, fin en SD11: 6 h ya ejecutadas fijas y solo las 5 restantes inciertas
+    bajo, moda, alto = DISTRIBUCION_DURACION[1]
+    m = modelo_riesgo(nuevo)
+    assert m["min"][curso][0] == pytest.approx(6 + 5 * bajo)
+    assert m["moda"][curso][0] == pytest.approx(6 + 5 * moda)
+    assert m["max"][curso][0] == pytest.approx(6 + 5 * alto)